@@ -1,13 +1,26 @@
 import os
-import json
+import cv2
+import msgpack
+import shutil
+import hashlib
+import queue
 import torch
 import logging
-from typing import Dict, List, Tuple
-from confluent_kafka import Consumer, Producer
+import threading
+import numpy as np
+import torch.nn.functional as F
+from typing import Dict, List, Optional, Tuple
+from confluent_kafka import Consumer, Producer, TopicPartition
 from ultralytics import YOLO
+from ultralytics.utils import ops
 from cryptography.fernet import Fernet
 from dotenv import load_dotenv
 
+try:
+    from nvidia import nvimgcodec
+except ImportError:
+    nvimgcodec = None
+
 # Load environment variables
 load_dotenv()
 
@@ -15,6 +28,46 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def pack_detections(detections: Dict) -> bytes:
+    """Pack detections into a MessagePack payload with raw array buffers.
+
+    Boxes are float32 [N, 4], labels int16 [N] and confidences float16 [N],
+    each stored as little-endian bytes alongside the detection count.
+    """
+    return msgpack.packb({
+        'frame_id': detections['frame_id'],
+        'count': len(detections['labels']),
+        'boxes': np.ascontiguousarray(detections['boxes'], dtype='<f4').tobytes(),
+        'labels': np.ascontiguousarray(detections['labels'], dtype='<i2').tobytes(),
+        'confidences': np.ascontiguousarray(detections['confidences'], dtype='<f2').tobytes()
+    }, use_bin_type=True)
+
+def unpack_detections(payload: bytes) -> Dict:
+    """Unpack a detections payload into numpy arrays without copying."""
+    message = msgpack.unpackb(payload, raw=False)
+    return {
+        'frame_id': message['frame_id'],
+        'boxes': np.frombuffer(message['boxes'], dtype='<f4').reshape(message['count'], 4),
+        'labels': np.frombuffer(message['labels'], dtype='<i2'),
+        'confidences': np.frombuffer(message['confidences'], dtype='<f2')
+    }
+
+def letterbox_batch(
+    frames: torch.Tensor,
+    size: Tuple[int, int],
+    padding: Tuple[int, int, int, int],
+    dtype: torch.dtype
+) -> torch.Tensor:
+    """Letterbox a (B, H, W, 3) uint8 batch into a normalized (B, 3, imgsz, imgsz) tensor.
+
+    Layout change, cast, resize, padding and scaling are written as one
+    function so torch.compile can fuse them into a few kernels.
+    """
+    images = frames.permute(0, 3, 1, 2).to(dtype)
+    images = F.interpolate(images, size=size, mode='bilinear', align_corners=False)
+    images = F.pad(images, padding, value=114.0)
+    return (images * (1 / 255)).contiguous()
+
 class YOLOWorldInference:
     def __init__(
         self,
@@ -22,7 +75,15 @@ class YOLOWorldInference:
         model_path: str,
         frames_topic: str = 'frames',
         detections_topic: str = 'detections',
-        partition: int = 0
+        partitions: Optional[List[int]] = None,
+        precision: str = 'fp16',
+        engine_cache_dir: str = '/engines',
+        int8_calib_data: Optional[str] = None,
+        imgsz: int = 640,
+        batch_size: int = 32,
+        max_wait_ms: int = 50,
+        cuda_graph: bool = True,
+        num_streams: int = 2
     ):
         """Initialize YOLO-World inference worker.
 
@@ -31,25 +92,115 @@ class YOLOWorldInference:
             model_path: Path to the YOLO-World model file
             frames_topic: Kafka topic for consuming frames
             detections_topic: Kafka topic for publishing detections
-            partition: Kafka partition to consume from
+            partitions: Kafka partitions to consume from, defaults to [0]
+            precision: TensorRT engine precision ('fp16', 'int8' or 'fp32' to skip the engine)
+            engine_cache_dir: Directory where built TensorRT engines are cached
+            int8_calib_data: Dataset YAML used for INT8 calibration
+            imgsz: Input size the TensorRT engine is built for
+            batch_size: Maximum number of frames run through the model in one call
+            max_wait_ms: Maximum time to wait for a batch to fill up
+            cuda_graph: Replay single-frame PyTorch inference from a captured CUDA graph
+            num_streams: Number of inference threads, each running on its own CUDA stream
         """
         self.consumer = Consumer({
             **kafka_config,
             'group.id': 'yolo_inference_group',
-            'auto.offset.reset': 'latest'
+            'auto.offset.reset': 'latest',
+            # Fetch frames in batches rather than one record at a time
+            'fetch.min.bytes': 65536,
+            'fetch.wait.max.ms': 50
+        })
+        self.producer = Producer({
+            **kafka_config,
+            # Batch and compress detection messages
+            'compression.type': 'zstd',
+            'linger.ms': 20,
+            'batch.num.messages': 10000,
+            'message.max.bytes': 10485760,
+            'queue.buffering.max.messages': 100000
         })
-        self.producer = Producer(kafka_config)
         self.frames_topic = frames_topic
         self.detections_topic = detections_topic
         
-        # Assign specific partition
-        self.consumer.assign([{'topic': frames_topic, 'partition': partition}])
+        # Assign all requested partitions to this worker
+        self.partitions = partitions if partitions else [0]
+        self.consumer.assign([
+            TopicPartition(frames_topic, partition) for partition in self.partitions
+        ])
         
-        # Load YOLO-World model
-        self.model = self._load_model(model_path)
         self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
         logger.info(f'Using device: {self.device}')
 
+        # TensorRT engine settings
+        self.precision = precision
+        self.engine_cache_dir = engine_cache_dir
+        self.int8_calib_data = int8_calib_data
+        self.imgsz = imgsz
+
+        # Model inputs are prepared in half precision for FP16 engines
+        self._input_dtype = torch.float16 if precision == 'fp16' and self.device == 'cuda' else torch.float32
+        self._letterbox = letterbox_batch
+        if self.device == 'cuda':
+            try:
+                self._letterbox = torch.compile(letterbox_batch, dynamic=True)
+            except Exception as e:
+                logger.warning(f'torch.compile unavailable, preprocessing eagerly: {e}')
+
+        # Batching settings
+        self.batch_size = batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.num_streams = max(1, num_streams)
+
+        # Model calls are serialized, uploads and preprocessing of other
+        # in-flight batches overlap on their own streams
+        self._model_lock = threading.Lock()
+
+        # Prompt whose class text embeddings are currently set on the model
+        self._current_prompt = None
+
+        # CUDA graph state, captured lazily for the first prompt seen
+        self.cuda_graph = cuda_graph
+        self._graph = None
+        self._graph_prompt = None
+        self._graph_txt_feats = None
+        self._static_input = None
+        self._static_output = None
+
+        # Per-thread pinned host buffers and copy stream for H2D uploads
+        self._upload_state = threading.local()
+
+        # Per-thread host scratch buffers that detections are copied into
+        self._detection_state = threading.local()
+
+        # nvJPEG decoder, frames are decoded with OpenCV when unavailable
+        self._decoder = None
+        if nvimgcodec is not None and self.device == 'cuda':
+            try:
+                self._decoder = nvimgcodec.Decoder()
+            except Exception as e:
+                logger.warning(f'nvJPEG decoder unavailable, decoding on CPU: {e}')
+
+        # Load YOLO-World model
+        self.model = self._load_model(model_path)
+
+        # Delivery reports are served by a background thread, off the produce path;
+        # started last so a failed model load does not leave it polling
+        self._stop = False
+        self._poll_thread = threading.Thread(target=self._poll_loop, daemon=True)
+        self._poll_thread.start()
+
+    def _poll_loop(self):
+        """Serve producer delivery callbacks until the worker is closed."""
+        while not self._stop:
+            self.producer.poll(0.1)
+
+    def close(self):
+        """Stop the poll thread, flush pending detections and close the consumer."""
+        self._stop = True
+        self.producer.flush(10)
+        self._poll_thread.join()
+        self.consumer.close()
+
     def _load_model(self, model_path: str) -> YOLO:
         """Load and decrypt YOLO-World model."""
         try:
@@ -69,75 +220,488 @@ class YOLOWorldInference:
                     decrypted_file.write(decrypted_data)
                 model_path = temp_model_path
 
-            return YOLO(model_path)
+            # Kept to rebuild the engine when the prompt vocabulary changes
+            self._model_path = model_path
+            return YOLO(self._build_engine(model_path))
         except Exception as e:
             logger.error(f'Error loading model: {e}')
             raise
 
+    def _uses_engine(self) -> bool:
+        """Check whether the model runs as a TensorRT engine rather than in PyTorch."""
+        return self.precision != 'fp32' and self.device == 'cuda'
+
+    def _build_engine(self, model_path: str, classes: Optional[List[str]] = None) -> str:
+        """Export the model to a TensorRT engine, reusing a cached build if present.
+
+        Engines are keyed by model hash, GPU compute capability, precision,
+        maximum batch size, input size, vocabulary and, for INT8, the
+        calibration dataset, so a build is only done once per combination.
+        The class text embeddings are baked into the engine at export, so
+        classes are set on the model before exporting.
+
+        Args:
+            model_path: Path to the PyTorch model
+            classes: Vocabulary to export with, the model's default when None
+
+        Returns:
+            Path to the TensorRT engine, or the original model path when
+            TensorRT is disabled or no GPU is available
+        """
+        if not self._uses_engine():
+            return model_path
+        if self.precision not in ('fp16', 'int8'):
+            raise ValueError(f'Unsupported engine precision: {self.precision}')
+        if self.precision == 'int8' and not self.int8_calib_data:
+            raise ValueError('INT8 precision requires a calibration dataset')
+
+        hasher = hashlib.sha256()
+        with open(model_path, 'rb') as model_file:
+            for chunk in iter(lambda: model_file.read(1 << 20), b''):
+                hasher.update(chunk)
+        key = hasher.hexdigest()[:16]
+        if self.precision == 'int8':
+            # A changed calibration set changes the INT8 scales baked into the engine
+            calib_hasher = hashlib.sha256(self.int8_calib_data.encode())
+            if os.path.isfile(self.int8_calib_data):
+                with open(self.int8_calib_data, 'rb') as calib_file:
+                    calib_hasher.update(calib_file.read())
+            key += f'_cal{calib_hasher.hexdigest()[:8]}'
+        if classes:
+            key += f"_v{hashlib.sha256(chr(0).join(classes).encode()).hexdigest()[:8]}"
+        major, minor = torch.cuda.get_device_capability()
+        engine_path = os.path.join(
+            self.engine_cache_dir,
+            f'{key}_sm{major}{minor}_{self.precision}_b{self.batch_size}_i{self.imgsz}.engine'
+        )
+        if os.path.exists(engine_path):
+            logger.info(f'Using cached TensorRT engine: {engine_path}')
+            return engine_path
+
+        logger.info(f'Building {self.precision} TensorRT engine for {model_path}')
+        export_args = {
+            'format': 'engine',
+            'half': self.precision == 'fp16',
+            'dynamic': True,
+            'batch': self.batch_size,
+            'imgsz': self.imgsz,
+            'workspace': 4
+        }
+        if self.precision == 'int8':
+            export_args.update(int8=True, data=self.int8_calib_data)
+        model = YOLO(model_path)
+        if classes:
+            model.set_classes(classes)
+        exported_path = model.export(**export_args)
+
+        os.makedirs(self.engine_cache_dir, exist_ok=True)
+        shutil.move(exported_path, engine_path)
+        return engine_path
+
+    def _parse_prompt(self, prompt: str) -> List[str]:
+        """Split a prompt like 'detect person, car, bike' into class names."""
+        if prompt.lower().startswith('detect '):
+            prompt = prompt[len('detect '):]
+        return [name.strip() for name in prompt.split(',') if name.strip()]
+
+    def _set_prompt(self, prompt: str):
+        """Set the model vocabulary from a prompt, only when the prompt changes.
+
+        set_classes runs the CLIP text encoder once and caches the embeddings,
+        so frames with an unchanged prompt skip the text branch entirely.
+        TensorRT engines keep the vocabulary they were exported with, so they
+        are swapped for an engine built with the new classes, from the cache
+        when that vocabulary was seen before.
+        """
+        if prompt == self._current_prompt:
+            return
+        classes = self._parse_prompt(prompt)
+        if self._uses_engine():
+            logger.info(f'Loading TensorRT engine for prompt {prompt!r}')
+            self.model = YOLO(self._build_engine(self._model_path, classes))
+        else:
+            self.model.set_classes(classes)
+        self._current_prompt = prompt
+
+    def _capture_graph(self, prompt: str) -> bool:
+        """Capture the model forward pass for a single frame in a CUDA graph.
+
+        Only the PyTorch model is captured; TensorRT engines already run as a
+        single fused engine. The graph bakes in the text embeddings of the
+        prompt it was captured with, so other prompts use the regular path.
+
+        Args:
+            prompt: Text prompt for object detection
+
+        Returns:
+            True if a graph is available for the prompt
+        """
+        if self._graph is not None:
+            return self._graph_prompt == prompt
+        if (not self.cuda_graph or self.device != 'cuda'
+                or not isinstance(self.model.model, torch.nn.Module)):
+            return False
+
+        try:
+            self._set_prompt(prompt)
+            module = self.model.model.to(self.device).eval()
+            self._static_input = torch.zeros(
+                (1, 3, self.imgsz, self.imgsz), device=self.device
+            )
+
+            # Warm up on a side stream so lazy initialization is not captured
+            stream = torch.cuda.Stream()
+            stream.wait_stream(torch.cuda.current_stream())
+            with torch.cuda.stream(stream), torch.inference_mode():
+                for _ in range(3):
+                    module(self._static_input)
+            torch.cuda.current_stream().wait_stream(stream)
+
+            graph = torch.cuda.CUDAGraph()
+            with torch.cuda.graph(graph), torch.inference_mode():
+                self._static_output = module(self._static_input)
+            self._graph = graph
+            self._graph_prompt = prompt
+            # The graph reads these embeddings, keep them alive across set_classes
+            self._graph_txt_feats = getattr(module, 'txt_feats', None)
+            logger.info(f'Captured CUDA graph for prompt: {prompt}')
+            return True
+
+        except Exception as e:
+            logger.warning(f'CUDA graph capture failed, using regular inference: {e}')
+            self.cuda_graph = False
+            return False
+
+    def _upload(self, frame: np.ndarray) -> torch.Tensor:
+        """Upload a BGR HWC uint8 frame to the GPU as an RGB tensor.
+
+        The frame is staged in one of two rotating pinned buffers and copied
+        with non_blocking=True on a dedicated stream, so the copy of one frame
+        overlaps inference of the previous one. A buffer is only refilled
+        once its previous copy has completed. Buffers and copy stream are
+        kept per inference thread.
+        """
+        state = self._upload_state
+        if not hasattr(state, 'copy_stream'):
+            state.host_bufs = [None, None]
+            state.host_events = [None, None]
+            state.host_index = 0
+            state.copy_stream = torch.cuda.Stream()
+
+        index = state.host_index
+        state.host_index ^= 1
+        if state.host_events[index] is not None:
+            state.host_events[index].synchronize()
+
+        frame = np.ascontiguousarray(frame)
+        host_buf = state.host_bufs[index]
+        if host_buf is None or host_buf.numel() < frame.nbytes:
+            host_buf = torch.empty(frame.nbytes, dtype=torch.uint8, pin_memory=True)
+            state.host_bufs[index] = host_buf
+        staging = host_buf[:frame.nbytes].view(frame.shape)
+        staging.copy_(torch.from_numpy(frame))
+
+        with torch.cuda.stream(state.copy_stream):
+            device_frame = staging.to(self.device, non_blocking=True)
+            event = torch.cuda.Event()
+            event.record(state.copy_stream)
+        state.host_events[index] = event
+
+        torch.cuda.current_stream().wait_stream(state.copy_stream)
+        device_frame.record_stream(torch.cuda.current_stream())
+        return device_frame.flip(-1)
+
+    def _letterbox_gpu(self, frames: List[torch.Tensor]) -> torch.Tensor:
+        """Letterbox RGB HWC uint8 CUDA frames into a (B, 3, imgsz, imgsz) tensor.
+
+        Frames of the same size are stacked and preprocessed in one fused call.
+        """
+        shape_groups: Dict[Tuple, List[int]] = {}
+        for i, frame in enumerate(frames):
+            shape_groups.setdefault(tuple(frame.shape), []).append(i)
+
+        images = [None] * len(frames)
+        for (height, width, _), indices in shape_groups.items():
+            ratio = min(self.imgsz / height, self.imgsz / width)
+            new_height, new_width = round(height * ratio), round(width * ratio)
+            top = (self.imgsz - new_height) // 2
+            left = (self.imgsz - new_width) // 2
+            padding = (left, self.imgsz - new_width - left, top, self.imgsz - new_height - top)
+
+            batch = torch.stack([frames[i] for i in indices])
+            try:
+                letterboxed = self._letterbox(batch, (new_height, new_width), padding, self._input_dtype)
+            except Exception as e:
+                # Compilation errors only surface on the first call
+                logger.warning(f'Compiled preprocessing failed, preprocessing eagerly: {e}')
+                self._letterbox = letterbox_batch
+                letterboxed = letterbox_batch(batch, (new_height, new_width), padding, self._input_dtype)
+            if len(shape_groups) == 1:
+                return letterboxed
+            for i, image in zip(indices, letterboxed):
+                images[i] = image
+
+        return torch.stack(images)
+
+    def _infer_graph(self, image: torch.Tensor, frame_shape: Tuple) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+        """Run a single letterboxed frame by replaying the captured CUDA graph.
+
+        Args:
+            image: Letterboxed frame as a (1, 3, imgsz, imgsz) tensor
+            frame_shape: Shape of the original HWC frame
+
+        Returns:
+            Tuple of boxes (xyxy, frame coordinates), labels and confidences
+        """
+        self._static_input.copy_(image)
+        self._graph.replay()
+        torch.cuda.current_stream().synchronize()
+
+        pred = ops.non_max_suppression(self._static_output)[0]
+        pred[:, :4] = ops.scale_boxes(self._static_input.shape[2:], pred[:, :4], frame_shape)
+        return pred[:, :4], pred[:, 5], pred[:, 4]
+
+    def _detection_buffers(self, size: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Return this thread's detection scratch buffers, holding at least size rows.
+
+        Buffers start at 256 rows and grow geometrically. Growing replaces the
+        buffers, so views handed out earlier keep referencing the old ones.
+        """
+        state = self._detection_state
+        capacity = len(state.boxes) if hasattr(state, 'boxes') else 0
+        if capacity < size:
+            capacity = max(size, 2 * capacity, 256)
+            state.boxes = np.empty((capacity, 4), dtype=np.float32)
+            state.labels = np.empty((capacity,), dtype=np.int16)
+            state.confidences = np.empty((capacity,), dtype=np.float16)
+        return state.boxes, state.labels, state.confidences
+
+    def _decode_batch(self, msgs: List) -> List[Dict]:
+        """Decode frames topic messages into frame data.
+
+        Message values are raw JPEGs and the prompt and frame ID are carried
+        in the message headers. JPEGs are decoded with nvJPEG straight into
+        RGB CUDA tensors when available, otherwise with OpenCV into BGR arrays.
+        """
+        jpegs = [msg.value() for msg in msgs]
+        frames = [None] * len(msgs)
+        if self._decoder is not None:
+            try:
+                images = self._decoder.decode(jpegs)
+                frames = [
+                    torch.as_tensor(image, device=self.device) if image is not None else None
+                    for image in images
+                ]
+            except Exception as e:
+                logger.warning(f'nvJPEG decode failed, falling back to OpenCV: {e}')
+
+        frames_data = []
+        for msg, jpeg, frame in zip(msgs, jpegs, frames):
+            try:
+                if frame is None:
+                    frame = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+                    if frame is None:
+                        raise ValueError('Failed to decode JPEG frame')
+
+                headers = {key: value.decode() for key, value in (msg.headers() or [])}
+                frames_data.append({
+                    'frame': frame,
+                    'prompt': headers['prompt'],
+                    'frame_id': int(headers['frame_id'])
+                })
+            except Exception as e:
+                logger.error(f'Error decoding message: {e}')
+
+        return frames_data
+
     def process_frame(self, frame_data: Dict) -> Dict:
         """Process a single frame with YOLO-World.
 
         Args:
-            frame_data: Dictionary containing frame bytes and prompt
+            frame_data: Dictionary containing the decoded frame (BGR array or
+                RGB CUDA tensor) and prompt
 
         Returns:
             Dictionary containing detection results
         """
-        try:
-            # Convert frame bytes to tensor
-            frame = torch.from_numpy(frame_data['frame'])
-            prompt = frame_data['prompt']
-            frame_id = frame_data['frame_id']
-
-            # Run inference with prompt
-            results = self.model(frame, prompt=prompt)
-            
-            # Extract detections
-            detections = {
-                'frame_id': frame_id,
-                'boxes': results[0].boxes.xyxy.tolist(),
-                'labels': results[0].boxes.cls.tolist(),
-                'confidences': results[0].boxes.conf.tolist()
-            }
-            
-            return detections
+        return self.process_batch([frame_data])[0]
 
-        except Exception as e:
-            logger.error(f'Error processing frame: {e}')
-            return None
+    def process_batch(self, frames_data: List[Dict]) -> List[Optional[Dict]]:
+        """Process a batch of frames with one YOLO-World call per prompt.
+
+        Args:
+            frames_data: List of dictionaries containing the decoded frame and prompt
+
+        Returns:
+            List of detection results in input order, None for failed frames.
+            Arrays are views into per-thread scratch buffers and are only
+            valid until the next call on the same thread.
+        """
+        detections = [None] * len(frames_data)
+        offset = 0
+
+        # Frames sharing a prompt are run through the model together
+        prompt_groups: Dict[str, List[int]] = {}
+        for i, frame_data in enumerate(frames_data):
+            prompt_groups.setdefault(frame_data['prompt'], []).append(i)
+
+        for prompt, indices in prompt_groups.items():
+            try:
+                frames = [frames_data[i]['frame'] for i in indices]
+
+                if self.device == 'cuda':
+                    # CPU-decoded frames are uploaded through pinned memory
+                    frames = [
+                        frame if isinstance(frame, torch.Tensor)
+                        else self._upload(np.asarray(frame, dtype=np.uint8))
+                        for frame in frames
+                    ]
+                    # Frames are letterboxed on device and fed as one tensor
+                    images = self._letterbox_gpu(frames)
+
+                    with self._model_lock:
+                        # Single frames replay the CUDA graph when one matches the prompt
+                        if len(frames) == 1 and self._capture_graph(prompt):
+                            outputs = [self._infer_graph(images, frames[0].shape)]
+                        else:
+                            self._set_prompt(prompt)
+                            results = self.model(images, batch=len(frames))
+                            outputs = [
+                                (
+                                    ops.scale_boxes(images.shape[2:], result.boxes.xyxy.clone(), frame.shape),
+                                    result.boxes.cls,
+                                    result.boxes.conf
+                                )
+                                for result, frame in zip(results, frames)
+                            ]
+                else:
+                    frames = [np.asarray(frame, dtype=np.uint8) for frame in frames]
+
+                    # Run batched inference with the prompt's vocabulary
+                    with self._model_lock:
+                        self._set_prompt(prompt)
+                        results = self.model(frames, batch=len(frames))
+                    outputs = [
+                        (result.boxes.xyxy, result.boxes.cls, result.boxes.conf)
+                        for result in results
+                    ]
+
+                # Copy the group's detections to the host once, straight
+                # into the scratch buffers in their serialized dtypes
+                counts = [len(boxes) for boxes, _, _ in outputs]
+                end = offset + sum(counts)
+                boxes_buf, labels_buf, conf_buf = self._detection_buffers(end)
+                torch.from_numpy(boxes_buf[offset:end]).copy_(torch.cat([output[0] for output in outputs]))
+                torch.from_numpy(labels_buf[offset:end]).copy_(torch.cat([output[1] for output in outputs]))
+                torch.from_numpy(conf_buf[offset:end]).copy_(torch.cat([output[2] for output in outputs]))
+
+                # Extract detections
+                for i, count in zip(indices, counts):
+                    detections[i] = {
+                        'frame_id': frames_data[i]['frame_id'],
+                        'boxes': boxes_buf[offset:offset + count],
+                        'labels': labels_buf[offset:offset + count],
+                        'confidences': conf_buf[offset:offset + count]
+                    }
+                    offset += count
+
+            except Exception as e:
+                logger.error(f'Error processing batch: {e}')
+
+        return detections
+
+    def _inference_loop(self, batches: queue.Queue, results: queue.Queue):
+        """Run decoded batches from the dispatch queue on this thread's CUDA stream.
+
+        Args:
+            batches: Queue of decoded batches, None signals shutdown
+            results: Queue packed detections are handed to the producer thread on
+        """
+        stream = torch.cuda.Stream() if self.device == 'cuda' else None
+        while True:
+            batch = batches.get()
+            if batch is None:
+                break
+            try:
+                if stream is not None:
+                    with torch.cuda.stream(stream):
+                        detections = self.process_batch(batch)
+                    stream.synchronize()
+                else:
+                    detections = self.process_batch(batch)
+                # Pack before the next batch reuses this thread's scratch buffers
+                for frame_detections in detections:
+                    if frame_detections:
+                        results.put((
+                            frame_detections['frame_id'],
+                            pack_detections(frame_detections)
+                        ))
+            except Exception as e:
+                logger.error(f'Error in inference thread: {e}')
+
+    def _produce_loop(self, results: queue.Queue):
+        """Publish packed detections from the results queue until None is received."""
+        while True:
+            item = results.get()
+            if item is None:
+                break
+            frame_id, payload = item
+            try:
+                self.producer.produce(
+                    self.detections_topic,
+                    key=str(frame_id),
+                    value=payload
+                )
+            except Exception as e:
+                logger.error(f'Error publishing detections: {e}')
 
     def run(self):
-        """Main inference loop."""
+        """Main inference loop.
+
+        This thread consumes and decodes batches from all assigned partitions
+        and dispatches them to a pool of inference threads, one per CUDA
+        stream, through a bounded queue. A single producer thread publishes
+        the detections.
+        """
+        batches = queue.Queue(maxsize=self.num_streams * 2)
+        results = queue.Queue(maxsize=self.batch_size * self.num_streams * 4)
+        workers = [
+            threading.Thread(target=self._inference_loop, args=(batches, results), daemon=True)
+            for _ in range(self.num_streams)
+        ]
+        publisher = threading.Thread(target=self._produce_loop, args=(results,), daemon=True)
+        for thread in workers + [publisher]:
+            thread.start()
+
         try:
             while True:
-                msg = self.consumer.poll(1.0)
-                if msg is None:
-                    continue
-                if msg.error():
-                    logger.error(f'Consumer error: {msg.error()}')
-                    continue
-
-                # Process message
-                try:
-                    frame_data = json.loads(msg.value())
-                    detections = self.process_frame(frame_data)
-                    
-                    if detections:
-                        # Publish results
-                        self.producer.produce(
-                            self.detections_topic,
-                            key=str(detections['frame_id']),
-                            value=json.dumps(detections)
-                        )
-                        self.producer.poll(0)
-
-                except Exception as e:
-                    logger.error(f'Error processing message: {e}')
+                # Wait for up to batch_size frames or max_wait seconds
+                msgs = self.consumer.consume(
+                    num_messages=self.batch_size,
+                    timeout=self.max_wait
+                )
+
+                valid_msgs = []
+                for msg in msgs:
+                    if msg.error():
+                        logger.error(f'Consumer error: {msg.error()}')
+                        continue
+                    valid_msgs.append(msg)
+
+                batch = self._decode_batch(valid_msgs) if valid_msgs else []
+                if batch:
+                    batches.put(batch)
 
         except KeyboardInterrupt:
             pass
         finally:
-            self.consumer.close()
+            for _ in workers:
+                batches.put(None)
+            for worker in workers:
+                worker.join()
+            results.put(None)
+            publisher.join()
+            self.close()
 
 def main():
     # Kafka configuration with SSL/TLS
@@ -150,13 +714,20 @@ def main():
     }
 
     # Initialize inference worker
-    partition = int(os.getenv('KAFKA_PARTITION', '0'))
+    partitions = os.getenv('KAFKA_PARTITIONS', os.getenv('KAFKA_PARTITION', '0'))
     model_path = os.getenv('MODEL_PATH', '/models/yolo_world_m.pt.enc')
     
     worker = YOLOWorldInference(
         kafka_config=kafka_config,
         model_path=model_path,
-        partition=partition
+        partitions=[int(partition) for partition in partitions.split(',')],
+        precision=os.getenv('ENGINE_PRECISION', 'fp16'),
+        engine_cache_dir=os.getenv('ENGINE_CACHE_DIR', '/engines'),
+        int8_calib_data=os.getenv('INT8_CALIB_DATA'),
+        batch_size=int(os.getenv('INFERENCE_BATCH_SIZE', '32')),
+        max_wait_ms=int(os.getenv('INFERENCE_MAX_WAIT_MS', '50')),
+        cuda_graph=os.getenv('CUDA_GRAPH', '1') == '1',
+        num_streams=int(os.getenv('INFERENCE_STREAMS', '2'))
     )
     
     worker.run()
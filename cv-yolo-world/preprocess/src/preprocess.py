@@ -1,12 +1,23 @@
 import os
 import cv2
-import json
 import logging
+import xxhash
+import threading
 from typing import Optional, Dict
 from confluent_kafka import Producer
 from dotenv import load_dotenv
 from cryptography.fernet import Fernet
 
+try:
+    import ffmpegcv
+except ImportError:
+    ffmpegcv = None
+
+try:
+    from nvidia import nvimgcodec
+except ImportError:
+    nvimgcodec = None
+
 # Load environment variables
 load_dotenv()
 
@@ -19,7 +30,10 @@ class VideoPreprocessor:
         self,
         kafka_config: Dict,
         frames_topic: str = 'frames',
-        frame_rate: int = 30
+        frame_rate: int = 30,
+        jpeg_quality: int = 95,
+        skip_duplicates: bool = True,
+        heartbeat_frames: int = 30
     ):
         """Initialize the video preprocessor with Kafka configuration.
 
@@ -27,11 +41,35 @@ class VideoPreprocessor:
             kafka_config: Kafka producer configuration including security settings
             frames_topic: Kafka topic for publishing frames
             frame_rate: Target frame rate for processing
+            jpeg_quality: JPEG quality used when encoding frames
+            skip_duplicates: Skip frames that look identical to the last published one
+            heartbeat_frames: Publish at least every this many frames even when unchanged
         """
         self.producer = Producer(kafka_config)
         self.frames_topic = frames_topic
         self.frame_rate = frame_rate
         self.frame_count = 0
+        self.jpeg_quality = jpeg_quality
+
+        # Duplicate frame detection state
+        self.skip_duplicates = skip_duplicates
+        self.heartbeat_frames = heartbeat_frames
+        self._last_hash = None
+        self._skipped_frames = 0
+
+        # Delivery reports are served by a background thread, off the frame loop
+        self._stop = False
+        self._poll_thread = threading.Thread(target=self._poll_loop, daemon=True)
+        self._poll_thread.start()
+
+        # nvJPEG encoder, frames are encoded with OpenCV when unavailable
+        self._encoder = None
+        if nvimgcodec is not None:
+            try:
+                self._encoder = nvimgcodec.Encoder()
+                self._encode_params = nvimgcodec.EncodeParams(quality=jpeg_quality)
+            except Exception as e:
+                logger.warning(f'nvJPEG encoder unavailable, encoding on CPU: {e}')
 
     def delivery_report(self, err, msg):
         """Callback for Kafka producer to report delivery status."""
@@ -40,6 +78,50 @@ class VideoPreprocessor:
         else:
             logger.debug(f'Message delivered to {msg.topic()} [{msg.partition()}]')
 
+    def _poll_loop(self):
+        """Serve producer delivery callbacks until the preprocessor is closed."""
+        while not self._stop:
+            self.producer.poll(0.1)
+
+    def close(self):
+        """Stop the poll thread and deliver any frames still queued."""
+        self._stop = True
+        self.producer.flush(10)
+        self._poll_thread.join()
+
+    def _is_duplicate(self, frame) -> bool:
+        """Check whether a frame is unchanged since the last published frame.
+
+        Frames are compared by an xxh3 hash of a 32x32 grayscale thumbnail,
+        quantized to absorb sensor noise. The hash is reset every
+        heartbeat_frames skipped frames so static scenes still publish.
+        """
+        thumb = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), (32, 32), interpolation=cv2.INTER_AREA)
+        frame_hash = xxhash.xxh3_64_intdigest((thumb >> 2).tobytes())
+
+        if frame_hash == self._last_hash and self._skipped_frames < self.heartbeat_frames:
+            self._skipped_frames += 1
+            return True
+
+        self._last_hash = frame_hash
+        self._skipped_frames = 0
+        return False
+
+    def _encode_frame(self, frame) -> bytes:
+        """Encode a BGR frame as JPEG, on the GPU with nvJPEG when available."""
+        if self._encoder is not None:
+            try:
+                rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                return self._encoder.encode(rgb_frame, 'jpeg', params=self._encode_params)
+            except Exception as e:
+                logger.warning(f'nvJPEG encode failed, encoding on CPU: {e}')
+                self._encoder = None
+
+        _, encoded_frame = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        # confluent-kafka rejects buffer objects such as memoryview, so this
+        # is the one copy between the encoder output and librdkafka's queue
+        return encoded_frame.tobytes()
+
     def process_frame(self, frame, prompt: str):
         """Process a single frame and publish to Kafka.
 
@@ -49,29 +131,41 @@ class VideoPreprocessor:
         """
         try:
             # Encode frame as JPEG
-            _, encoded_frame = cv2.imencode('.jpg', frame)
-            frame_bytes = encoded_frame.tobytes()
+            frame_bytes = self._encode_frame(frame)
 
-            # Prepare message payload
-            message = {
-                'frame': frame_bytes,
-                'prompt': prompt,
-                'frame_id': self.frame_count
-            }
-
-            # Publish to Kafka
+            # Publish raw JPEG bytes with prompt and frame ID as headers
+            frame_id = str(self.frame_count).encode()
             self.producer.produce(
                 self.frames_topic,
-                key=str(self.frame_count),
-                value=json.dumps(message),
+                key=frame_id,
+                value=frame_bytes,
+                headers=[
+                    ('prompt', prompt.encode()),
+                    ('frame_id', frame_id)
+                ],
                 callback=self.delivery_report
             )
-            self.producer.poll(0)
             self.frame_count += 1
 
         except Exception as e:
             logger.error(f'Error processing frame: {e}')
 
+    def _open_capture(self, video_source: str):
+        """Open a video source, decoding on the NVIDIA NVDEC engine when available.
+
+        Network streams use ffmpegcv's low-latency reader, files use NVDEC with
+        a CPU ffmpeg fallback, and camera indices keep using OpenCV.
+        """
+        if ffmpegcv is None or video_source.isdigit():
+            return cv2.VideoCapture(video_source)
+        if video_source.startswith(('rtsp://', 'rtmp://', 'http://', 'https://')):
+            return ffmpegcv.VideoCaptureStreamRT(video_source)
+        try:
+            return ffmpegcv.VideoCaptureNV(video_source, pix_fmt='bgr24')
+        except Exception as e:
+            logger.warning(f'NVDEC unavailable, decoding on CPU: {e}')
+            return ffmpegcv.VideoCapture(video_source, pix_fmt='bgr24')
+
     def process_video(self, video_source: str, prompt: str):
         """Process video stream and publish frames to Kafka.
 
@@ -81,7 +175,7 @@ class VideoPreprocessor:
         """
         try:
             # Open video capture
-            cap = cv2.VideoCapture(video_source)
+            cap = self._open_capture(video_source)
             if not cap.isOpened():
                 raise ValueError(f'Failed to open video source: {video_source}')
 
@@ -90,8 +184,11 @@ class VideoPreprocessor:
                 if not ret:
                     break
 
+                # Unchanged frames are dropped before encoding
+                if self.skip_duplicates and self._is_duplicate(frame):
+                    continue
+
                 self.process_frame(frame, prompt)
-                self.producer.flush()
 
         except Exception as e:
             logger.error(f'Error processing video: {e}')
@@ -106,17 +203,31 @@ def main():
         'security.protocol': 'SSL',
         'ssl.ca.location': '/security/kafka.crt',
         'ssl.keystore.location': '/security/kafka.key',
-        'ssl.keystore.password': os.getenv('KAFKA_SSL_KEYSTORE_PASSWORD')
+        'ssl.keystore.password': os.getenv('KAFKA_SSL_KEYSTORE_PASSWORD'),
+        # Let librdkafka batch frames instead of sending them one by one
+        'linger.ms': 20,
+        'batch.num.messages': 10000,
+        'compression.type': 'lz4',
+        'message.max.bytes': 10485760,
+        'queue.buffering.max.messages': 100000,
+        'queue.buffering.max.kbytes': 1048576
     }
 
     # Initialize preprocessor
-    preprocessor = VideoPreprocessor(kafka_config)
+    preprocessor = VideoPreprocessor(
+        kafka_config,
+        skip_duplicates=os.getenv('SKIP_DUPLICATE_FRAMES', '1') == '1',
+        heartbeat_frames=int(os.getenv('HEARTBEAT_FRAMES', '30'))
+    )
 
     # Process video with detection prompt
     video_source = os.getenv('VIDEO_SOURCE', '0')  # Default to webcam
     detection_prompt = os.getenv('DETECTION_PROMPT', 'detect person, car, bike')
     
-    preprocessor.process_video(video_source, detection_prompt)
+    try:
+        preprocessor.process_video(video_source, detection_prompt)
+    finally:
+        preprocessor.close()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
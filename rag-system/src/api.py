@@ -1,27 +1,45 @@
 from flask import Flask, request, jsonify
-from services.pipeline_service import PipelineService
-from services.niche_analysis_service import NicheAnalysisError
+from services.pipeline_service import get_pipeline_service
+from services.rag_service import create_mongo_client
+from services.niche_analysis_service import NicheAnalysisError, create_ollama_session
 import logging
 import os
+import queue
+import atexit
+from logging.handlers import QueueHandler, QueueListener
 from dotenv import load_dotenv
-from typing import Dict, Any
+from typing import Dict, Any, Iterable
 from werkzeug.exceptions import HTTPException, BadRequest
 import json
-from pymongo import MongoClient
-import requests
 
 # Load environment variables
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Configure logging; records are written by a listener thread so request
+# threads never block on stream I/O
+log_queue = queue.SimpleQueue()
+log_listener = QueueListener(log_queue, logging.StreamHandler())
+logging.basicConfig(level=logging.INFO, handlers=[QueueHandler(log_queue)])
+log_listener.start()
+atexit.register(log_listener.stop)
 logger = logging.getLogger(__name__)
 
 # Initialize Flask app
 app = Flask(__name__)
 
-# Initialize pipeline service
-pipeline_service = PipelineService()
+# Accepted request values
+VALID_PLATFORMS = frozenset({'twitter', 'linkedin', 'facebook', 'medium', 'github'})
+VALID_STYLES = frozenset({'professional', 'casual', 'technical', 'informal', 'formal', 'friendly'})
+REQUIRED_FIELDS = ('account_id', 'topic', 'query')
+
+# Shared HTTP session so Ollama calls reuse pooled keep-alive connections
+http_session = create_ollama_session(pool_maxsize=32)
+
+# Shared MongoDB client, connects lazily and pools connections
+mongo_client = create_mongo_client()
+
+# Initialize the shared pipeline service
+pipeline_service = get_pipeline_service(session=http_session, mongo_client=mongo_client)
 
 class APIError(Exception):
     """Base class for API errors"""
@@ -82,20 +100,14 @@ def handle_unexpected_error(error):
 def validate_json_content():
     """Validate that request has JSON content"""
     if not request.is_json:
-        raise ValidationError(
-            "Content-Type must be application/json",
-            details={"content_type": request.content_type}
-        )
+        raise ValidationError("Content-Type must be application/json")
     
     try:
         request.get_json()
-    except BadRequest as e:
-        raise ValidationError(
-            "Invalid JSON format",
-            details={"error": str(e)}
-        )
+    except BadRequest:
+        raise ValidationError("Invalid JSON format")
 
-def validate_required_fields(data: Dict[str, Any], required_fields: list):
+def validate_required_fields(data: Dict[str, Any], required_fields: Iterable[str]):
     """Validate that all required fields are present"""
     missing_fields = [field for field in required_fields if field not in data]
     if missing_fields:
@@ -106,13 +118,23 @@ def validate_required_fields(data: Dict[str, Any], required_fields: list):
 
 def validate_platform(platform: str):
     """Validate platform value"""
-    valid_platforms = ['twitter', 'linkedin', 'medium', 'github']
-    if platform not in valid_platforms:
+    if platform not in VALID_PLATFORMS:
         raise ValidationError(
             "Invalid platform",
             details={
                 "platform": platform,
-                "valid_platforms": valid_platforms
+                "valid_platforms": sorted(VALID_PLATFORMS)
+            }
+        )
+
+def validate_content_style(content_style: str):
+    """Validate content style value"""
+    if content_style not in VALID_STYLES:
+        raise ValidationError(
+            "Invalid content style",
+            details={
+                "content_style": content_style,
+                "valid_styles": sorted(VALID_STYLES)
             }
         )
 
@@ -120,63 +142,15 @@ def validate_platform(platform: str):
 def generate_content():
     """Generate content based on user input."""
     # Validate JSON content
-    if not request.is_json:
-        return jsonify({
-            'error': {
-                'code': 'VALIDATION_ERROR',
-                'message': 'Content-Type must be application/json',
-                'details': None
-            }
-        }), 400
-
-    try:
-        data = request.get_json()
-    except BadRequest:
-        return jsonify({
-            'error': {
-                'code': 'VALIDATION_ERROR',
-                'message': 'Invalid JSON format',
-                'details': None
-            }
-        }), 400
-    
-    # Validate required fields
-    required_fields = ['account_id', 'topic', 'query']
-    missing_fields = [field for field in required_fields if field not in data]
-    if missing_fields:
-        return jsonify({
-            'error': {
-                'code': 'VALIDATION_ERROR',
-                'message': 'Missing required fields',
-                'details': {'missing_fields': missing_fields}
-            }
-        }), 400
+    validate_json_content()
+    data = request.get_json()
 
-    # Extract and validate platform
+    # Validate required fields, platform and content style
+    validate_required_fields(data, REQUIRED_FIELDS)
     platform = data.get('platform', 'twitter')
-    if platform not in ['twitter', 'linkedin', 'facebook']:
-        return jsonify({
-            'error': {
-                'code': 'VALIDATION_ERROR',
-                'message': 'Invalid platform',
-                'details': {'platform': platform}
-            }
-        }), 400
-
-    # Extract content style with default
+    validate_platform(platform)
     content_style = data.get('content_style', 'professional')
-    valid_styles = ['professional', 'casual', 'technical', 'informal', 'formal', 'friendly']
-    if content_style not in valid_styles:
-        return jsonify({
-            'error': {
-                'code': 'VALIDATION_ERROR',
-                'message': 'Invalid content style',
-                'details': {
-                    'content_style': content_style,
-                    'valid_styles': valid_styles
-                }
-            }
-        }), 400
+    validate_content_style(content_style)
 
     try:
         # Process the request through the pipeline
@@ -187,49 +161,38 @@ def generate_content():
             platform=platform,
             content_style=content_style
         )
-
-        return jsonify({
-            'success': True,
-            'data': result
-        }), 200
-
     except NicheAnalysisError as e:
         logger.error(f"Niche analysis error: {str(e)}")
-        return jsonify({
-            'error': {
-                'code': 'NICHE_ANALYSIS_ERROR',
-                'message': str(e),
-                'details': None
-            }
-        }), 400
-
+        raise APIError(str(e), 400, 'NICHE_ANALYSIS_ERROR')
     except Exception as e:
         logger.error(f"Unexpected error: {str(e)}", exc_info=True)
-        return jsonify({
-            'error': {
-                'code': 'INTERNAL_ERROR',
-                'message': 'Internal server error',
-                'details': str(e)
-            }
-        }), 500
+        raise APIError('Internal server error', 500, 'INTERNAL_ERROR', str(e))
+
+    return jsonify({
+        'success': True,
+        'data': result
+    }), 200
 
-# Run the server
+# Run the development server; production is served by gunicorn (see gunicorn.conf.py)
 if __name__ == '__main__':
     try:
         # Check MongoDB connection
-        client = MongoClient(os.getenv('MONGO_URI', 'mongodb://localhost:27017'))
-        client.server_info()
+        mongo_client.admin.command('ping')
         logger.info("MongoDB connection successful")
         
         # Check Ollama connection
         ollama_host = os.getenv('OLLAMA_HOST', 'http://localhost:11434')
-        response = requests.get(f"{ollama_host}/api/tags")
+        response = http_session.get(f"{ollama_host}/api/tags")
         if response.status_code == 200:
             logger.info("Ollama connection successful")
         else:
             raise Exception("Ollama service is not running")
-            
-        logger.info("Starting API server on http://127.0.0.1:5001")
+
+        if not os.getenv('DEV'):
+            logger.error("Set DEV=1 to run the development server, or serve with: gunicorn -c gunicorn.conf.py api:app")
+            raise SystemExit(1)
+
+        logger.info("Starting development server on http://127.0.0.1:5001")
         app.run(host='127.0.0.1', port=5001, debug=True)
     except Exception as e:
         logger.error(f"Failed to start server: {str(e)}")
@@ -0,0 +1,14 @@
+"""Gunicorn configuration for the RAG System API.
+
+Run from the src directory with: gunicorn -c gunicorn.conf.py api:app
+"""
+import multiprocessing
+import os
+
+# The gevent worker monkey-patches the standard library before loading the
+# app, so blocking MongoDB and Ollama I/O yields to other requests
+worker_class = 'gevent'
+workers = int(os.getenv('API_WORKERS', multiprocessing.cpu_count()))
+worker_connections = int(os.getenv('API_WORKER_CONNECTIONS', '1000'))
+bind = os.getenv('API_BIND', '0.0.0.0:5001')
+timeout = int(os.getenv('API_TIMEOUT', '120'))
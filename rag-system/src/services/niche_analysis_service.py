@@ -1,9 +1,21 @@
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Tuple
+import asyncio
+import copy
 import logging
-from dataclasses import dataclass
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict, field
 from datetime import datetime
+import httpx
+import numpy as np
 import requests
-import json
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import orjson
 import os
 from dotenv import load_dotenv
 
@@ -12,6 +24,122 @@ load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# First bracketed list in an LLM response, ignoring code fences and commentary
+_JSON_ARRAY_RE = re.compile(r'\[.*?\]', re.DOTALL)
+
+_VALID_STYLES = frozenset({'professional', 'casual', 'technical', 'academic', 'conversational'})
+_VALID_PLATFORMS = frozenset({'twitter', 'linkedin', 'medium', 'github'})
+
+# Generation caps; one-word answers need few tokens, JSON arrays and objects more
+_WORD_TOKENS = 16
+_LIST_TOKENS = 64
+_KEYWORD_TOKENS = 128
+_ANALYSIS_TOKENS = 512
+
+# Default sampling temperature; responses are cached only at or below it
+_TEMPERATURE = 0.2
+
+# JSON schemas for Ollama structured outputs, used when OLLAMA_STRUCTURED=1
+_SUBTOPICS_SCHEMA = {"type": "array", "items": {"type": "string"}, "minItems": 3, "maxItems": 5}
+_KEYWORDS_SCHEMA = {"type": "array", "items": {"type": "string"}, "minItems": 5, "maxItems": 10}
+_PLATFORMS_SCHEMA = {
+    "type": "array",
+    "items": {"type": "string", "enum": sorted(_VALID_PLATFORMS)},
+    "minItems": 1
+}
+
+_PREFERENCE_FIELDS = frozenset({'platform', 'style', 'query_context'})
+
+_JSON_HEADERS = {'Content-Type': 'application/json'}
+
+# Connect and read timeouts for topic embeddings, a slow embedding is a cache miss
+_EMBED_TIMEOUT = (1, 3)
+
+# Attempts for Ollama calls failing with a timeout or connection error
+_MAX_ATTEMPTS = 3
+_BACKOFF_SECONDS = 0.5
+
+# Prompt templates, dedented so no indentation whitespace is sent to the model
+_ANALYSIS_PROMPT = """Analyze the following user input for content creation.
+Return a single JSON object with exactly these keys:
+- "main_topic": the main topic as a string
+- "subtopics": a JSON array of 3-5 relevant subtopics
+- "keywords": a JSON array of 5-10 SEO keywords for the topic and subtopics
+- "content_style": one of professional, casual, technical, academic, or conversational
+- "target_platforms": a JSON array chosen from twitter, linkedin, medium, github
+Return only the JSON object, nothing else.
+
+User Input: {topic}
+Preferences: {prefs}"""
+
+_BATCH_ANALYSIS_PROMPT = """Analyze each of the following {count} user inputs for content creation.
+Return a JSON array of {count} objects, in the same order as the inputs, each with exactly these keys:
+- "main_topic": the main topic as a string
+- "subtopics": a JSON array of 3-5 relevant subtopics
+- "keywords": a JSON array of 5-10 SEO keywords for the topic and subtopics
+- "content_style": one of professional, casual, technical, academic, or conversational
+- "target_platforms": a JSON array chosen from twitter, linkedin, medium, github
+Return only the JSON array, nothing else.
+
+Inputs: {inputs}"""
+
+_TOPIC_PROMPT = """Analyze the following user input and extract the main topic.
+Return only the main topic, nothing else.
+
+User Input: {topic}
+Preferences: {prefs}"""
+
+_SUBTOPICS_PROMPT = """Generate 3-5 relevant subtopics for the main topic: {topic}
+Return the subtopics as a JSON array of strings."""
+
+_KEYWORDS_PROMPT = """Generate 5-10 SEO keywords for the following topic and subtopics.
+Return the keywords as a JSON array of strings.
+
+Main Topic: {topic}
+Subtopics: {subtopics}"""
+
+_STYLE_PROMPT = """Analyze the following user preferences and determine the most appropriate content style.
+Choose from: professional, casual, technical, academic, or conversational.
+Return only the style, nothing else.
+
+Preferences: {prefs}"""
+
+_PLATFORMS_PROMPT = """Analyze the following user preferences and determine the most appropriate platforms.
+Choose from: twitter, linkedin, medium, github.
+Return the platforms as a JSON array of strings.
+
+Preferences: {prefs}"""
+
+def create_ollama_session(pool_maxsize: int = 16) -> requests.Session:
+    """
+    Create a keep-alive session for Ollama calls that retries overloaded responses.
+    
+    Only 429 and 5xx responses are retried here. Timeouts and connection errors
+    are retried with backoff in NicheAnalysisService._request_ollama, so each
+    failure goes through a single retry layer.
+    
+    Args:
+        pool_maxsize: Connections kept open per host
+        
+    Returns:
+        Session with the retrying adapter mounted
+    """
+    session = requests.Session()
+    retry = Retry(
+        total=3,
+        connect=0,
+        read=0,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["POST"],
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=8, pool_maxsize=pool_maxsize, max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers['Connection'] = 'keep-alive'
+    return session
+
 class NicheAnalysisError(Exception):
     """Base class for NicheAnalysisService errors"""
     def __init__(self, message, details=None):
@@ -34,13 +162,69 @@ class NicheAnalysis:
     content_style: str
     target_platforms: List[str]
     generated_at: datetime
+    # Subtopics as joined into keyword prompts, refreshed when subtopics change
+    _subtopics_str: str = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self._subtopics_str = ', '.join(self.subtopics)
 
 class NicheAnalysisService:
-    def __init__(self):
+    def __init__(self, session: Optional[requests.Session] = None):
         self.logger = logging.getLogger(__name__)
+        self.session = session or create_ollama_session()
         self.ollama_host = os.getenv('OLLAMA_HOST', 'http://localhost:11434')
         self.model_name = os.getenv('MODEL_NAME', 'gemma:7b')
         self._validate_config()
+        self._chat_url = f"{self.ollama_host}/api/chat"
+        # Constrain list prompts with JSON schemas, needs an Ollama with structured outputs
+        self._structured = os.getenv('OLLAMA_STRUCTURED', '0') == '1'
+        # How long Ollama keeps the model loaded after a request
+        self._keep_alive = os.getenv('OLLAMA_KEEP_ALIVE', '30m')
+        # Encoded request body up to the prompt, which is the only part that varies
+        self._payload_prefix = (
+            orjson.dumps({"model": self.model_name, "stream": True, "keep_alive": self._keep_alive})[:-1]
+            + b',"messages":[{"role":"user","content":'
+        )
+        # Sampling temperature, None keeps the model default
+        self.temperature: Optional[float] = _TEMPERATURE
+        # LRU cache of responses keyed by a hash of model and prompt
+        self._response_cache: OrderedDict = OrderedDict()
+        self._cache_size = int(os.getenv('OLLAMA_CACHE_SIZE', '1024'))
+        self._cache_lock = threading.Lock()
+        # Created on first async call, bound to that call's event loop
+        self._async_client: Optional[httpx.AsyncClient] = None
+        # Runs independent per-field Ollama calls concurrently
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='niche-analysis')
+        # Opt-in reuse of analyses for topics whose embeddings are this similar,
+        # embedded with a small sentence embedding model rather than the chat model
+        self._semantic_enabled = os.getenv('NICHE_SEMANTIC_CACHE', '0') == '1'
+        self._semantic_threshold = float(os.getenv('NICHE_SEMANTIC_THRESHOLD', '0.92'))
+        self._embed_model = os.getenv('NICHE_EMBED_MODEL', 'all-minilm')
+        self._semantic_path = os.getenv('NICHE_SEMANTIC_CACHE_PATH')
+        self._semantic_embeddings: Optional[np.ndarray] = None
+        self._semantic_entries: List[Tuple[str, NicheAnalysis]] = []
+        self._semantic_lock = threading.Lock()
+        # Set when entries were added since the cache was last persisted
+        self._semantic_dirty = False
+        if self._semantic_enabled:
+            self._load_semantic_cache()
+        # Opt-in background model load so the first request does not pay for it
+        if os.getenv('OLLAMA_WARMUP', '0') == '1':
+            threading.Thread(target=self._warmup, daemon=True, name='niche-analysis-warmup').start()
+
+    def _warmup(self):
+        """Load the model into Ollama's memory with an empty generate request."""
+        try:
+            response = self.session.post(
+                f"{self.ollama_host}/api/generate",
+                data=orjson.dumps({"model": self.model_name, "keep_alive": self._keep_alive}),
+                headers=_JSON_HEADERS,
+                timeout=300  # Loading large weights can take minutes
+            )
+            response.raise_for_status()
+            self.logger.info("Ollama model %s loaded", self.model_name)
+        except Exception as e:
+            self.logger.warning("Ollama warm-up failed: %s", e)
 
     def _validate_config(self):
         """Validate service configuration"""
@@ -51,12 +235,11 @@ class NicheAnalysisService:
 
     def _validate_user_input(self, user_input: Dict[str, Any]):
         """Validate user input structure"""
-        self.logger.info(f"Validating user input: {user_input}")
-        self.logger.info(f"User input type: {type(user_input)}")
+        self.logger.debug("Validating user input: %s", user_input)
         
         # Ensure input is a dictionary
         if not isinstance(user_input, dict):
-            self.logger.error(f"Invalid input type: {type(user_input)}")
+            self.logger.error("Invalid input type: %s", type(user_input))
             raise ValidationError("User input must be a dictionary")
         
         # Ensure topic exists and is not empty
@@ -64,69 +247,508 @@ class NicheAnalysisService:
             self.logger.error("Missing topic in user input")
             raise ValidationError("Topic is required in user input")
         
-        # Ensure preferences exist and is a dictionary
-        if 'preferences' not in user_input:
-            user_input['preferences'] = {}
-        elif not isinstance(user_input['preferences'], dict):
-            self.logger.error(f"Invalid preferences type: {type(user_input['preferences'])}")
+        # Ensure preferences is a dictionary
+        if 'preferences' in user_input and not isinstance(user_input['preferences'], dict):
+            self.logger.error("Invalid preferences type: %s", type(user_input['preferences']))
             raise ValidationError("Preferences must be a dictionary")
         
-        # Ensure all required fields in preferences are present
-        if 'platform' not in user_input['preferences']:
-            user_input['preferences']['platform'] = 'twitter'
-        if 'style' not in user_input['preferences']:
-            user_input['preferences']['style'] = 'professional'
-        if 'query_context' not in user_input['preferences']:
-            user_input['preferences']['query_context'] = user_input.get('topic', '')
-        
-        # Log validation results
-        self.logger.info(f"Validated user input: {user_input}")
-        self.logger.info(f"Validated user input type: {type(user_input)}")
-        self.logger.info(f"Validated user input keys: {user_input.keys()}")
-        self.logger.info(f"Validated preferences: {user_input['preferences']}")
-        self.logger.info(f"Validated preferences type: {type(user_input['preferences'])}")
+        self._apply_defaults(user_input)
+        self.logger.debug("Validated user input: %s", user_input)
         
         return user_input
 
-    def _call_ollama(self, prompt: str) -> str:
-        """Call Ollama API with the given prompt."""
+    @staticmethod
+    def _apply_defaults(user_input: Dict[str, Any]) -> Dict[str, Any]:
+        """Fill in missing preference fields; a no-op when they are all present."""
+        preferences = user_input.setdefault('preferences', {})
+        if preferences.keys() >= _PREFERENCE_FIELDS:
+            return user_input
+        preferences.setdefault('platform', 'twitter')
+        preferences.setdefault('style', 'professional')
+        preferences.setdefault('query_context', user_input.get('topic', ''))
+        return user_input
+
+    def set_temperature(self, temperature: Optional[float]):
+        """Set the sampling temperature; responses are not cached above the default or with None."""
+        self.temperature = temperature
+
+    def _caching(self) -> bool:
+        """Whether responses may be cached at the temperature sent with each request."""
+        return self._cache_size > 0 and self.temperature is not None and self.temperature <= _TEMPERATURE
+
+    def _cache_key(self, prompt: str, max_tokens: int, format_schema: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """Build a bounded-size cache key from the model name, request options and prompt, None when caching is off."""
+        if not self._caching():
+            return None
+        schema = orjson.dumps(format_schema).decode() if format_schema else ''
+        return hashlib.blake2b(
+            f"{self.model_name}\0{max_tokens}\0{self.temperature}\0{schema}\0{prompt}".encode(), digest_size=16
+        ).hexdigest()
+
+    def _cache_get(self, key: Optional[str]) -> Optional[str]:
+        """Return a cached response and mark it as recently used."""
+        if key is None:
+            return None
+        with self._cache_lock:
+            if key in self._response_cache:
+                self._response_cache.move_to_end(key)
+                return self._response_cache[key]
+        return None
+
+    def _cache_put(self, key: Optional[str], content: str):
+        """Store a non-empty response, evicting the least recently used one."""
+        if key is None or not content:
+            return
+        with self._cache_lock:
+            self._response_cache[key] = content
+            self._response_cache.move_to_end(key)
+            if len(self._response_cache) > self._cache_size:
+                self._response_cache.popitem(last=False)
+
+    def _embed_topic(self, topic: str) -> Optional[np.ndarray]:
+        """Embed a normalized topic with the embedding model, returning a unit vector or None on failure."""
         try:
-            response = requests.post(
-                f"{self.ollama_host}/api/chat",
-                json={
-                    "model": self.model_name,
-                    "messages": [
-                        {"role": "user", "content": prompt}
-                    ],
-                    "stream": False
-                },
-                timeout=30  # 30 second timeout
+            response = self.session.post(
+                f"{self.ollama_host}/api/embeddings",
+                data=orjson.dumps({"model": self._embed_model, "prompt": topic.lower().strip()}),
+                headers=_JSON_HEADERS,
+                timeout=_EMBED_TIMEOUT
             )
             response.raise_for_status()
-            result = response.json()
-            if 'message' in result:
-                return result['message']['content']
-            return result.get('response', '')
-        except requests.exceptions.Timeout:
-            raise OllamaError("Ollama API request timed out")
-        except requests.exceptions.ConnectionError:
-            raise OllamaError("Failed to connect to Ollama service")
-        except requests.exceptions.RequestException as e:
-            raise OllamaError(f"Ollama API request failed: {str(e)}")
-        except (KeyError, json.JSONDecodeError) as e:
-            raise OllamaError(f"Invalid response from Ollama: {str(e)}")
+            embedding = np.asarray(orjson.loads(response.content)['embedding'], dtype=np.float32)
+        except Exception as e:
+            self.logger.debug("Topic embedding failed: %s", e)
+            return None
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm else None
+
+    @staticmethod
+    def _semantic_key(user_input: Dict[str, Any]) -> str:
+        """Preferences an analysis must share to be reused for a similar topic."""
+        preferences = user_input.get('preferences', {})
+        return f"{preferences.get('platform', '')}\0{preferences.get('style', '')}"
+
+    def _semantic_lookup(self, user_input: Dict[str, Any]) -> Tuple[Optional[np.ndarray], Optional[NicheAnalysis]]:
+        """
+        Find a cached analysis for a semantically similar topic.
+        
+        Args:
+            user_input: Validated user input
+            
+        Returns:
+            The topic embedding, None when reuse is off or embedding failed, and a
+            copy of the cached analysis, None on a miss
+        """
+        if not self._semantic_enabled or not self._caching():
+            return None, None
+        embedding = self._embed_topic(user_input.get('topic', ''))
+        if embedding is None:
+            return None, None
+        key = self._semantic_key(user_input)
+        with self._semantic_lock:
+            if self._semantic_embeddings is None or self._semantic_embeddings.shape[1] != embedding.shape[0]:
+                return embedding, None
+            scores = self._semantic_embeddings @ embedding
+            for index in np.argsort(scores)[::-1]:
+                if scores[index] < self._semantic_threshold:
+                    break
+                entry_key, analysis = self._semantic_entries[index]
+                if entry_key == key:
+                    # Callers such as update_analysis modify the analysis in place
+                    return embedding, copy.deepcopy(analysis)
+        return embedding, None
+
+    def _semantic_store(self, embedding: Optional[np.ndarray], user_input: Dict[str, Any], analysis: NicheAnalysis):
+        """Add a copy of an analysis to the semantic cache, evicting the oldest beyond the cache size."""
+        if embedding is None:
+            return
+        # The caller keeps the analysis it was given and may modify it in place
+        analysis = copy.deepcopy(analysis)
+        with self._semantic_lock:
+            if self._semantic_embeddings is None or self._semantic_embeddings.shape[1] != embedding.shape[0]:
+                self._semantic_embeddings = embedding[np.newaxis, :]
+                self._semantic_entries = []
+            else:
+                self._semantic_embeddings = np.vstack([self._semantic_embeddings, embedding])
+            self._semantic_entries.append((self._semantic_key(user_input), analysis))
+            if len(self._semantic_entries) > self._cache_size:
+                self._semantic_embeddings = self._semantic_embeddings[-self._cache_size:]
+                self._semantic_entries = self._semantic_entries[-self._cache_size:]
+            # Persist off the request path; stores made before the save runs share it
+            save = bool(self._semantic_path) and not self._semantic_dirty
+            self._semantic_dirty = True
+        if save:
+            self._executor.submit(self._save_semantic_cache)
+
+    def _load_semantic_cache(self):
+        """Load a semantic cache persisted under NICHE_SEMANTIC_CACHE_PATH, if any."""
+        if not self._semantic_path or not os.path.exists(f"{self._semantic_path}.npy"):
+            return
+        try:
+            embeddings = np.load(f"{self._semantic_path}.npy")
+            with open(f"{self._semantic_path}.json", 'rb') as f:
+                entries = orjson.loads(f.read())
+            if len(entries) != len(embeddings):
+                raise ValueError("embeddings and analyses are out of sync")
+            self._semantic_entries = [
+                (entry['key'], NicheAnalysis(**{
+                    **entry['analysis'],
+                    'generated_at': datetime.fromisoformat(entry['analysis']['generated_at'])
+                }))
+                for entry in entries
+            ]
+            self._semantic_embeddings = embeddings
+        except Exception as e:
+            self.logger.warning("Ignoring unreadable semantic cache %s: %s", self._semantic_path, e)
+
+    def _save_semantic_cache(self):
+        """Persist a snapshot of the semantic cache, writing the files outside the lock."""
+        with self._semantic_lock:
+            if not self._semantic_path or not self._semantic_dirty:
+                return
+            self._semantic_dirty = False
+            embeddings = self._semantic_embeddings
+            entries = list(self._semantic_entries)
+        try:
+            np.save(f"{self._semantic_path}.npy", embeddings)
+            with open(f"{self._semantic_path}.json", 'wb') as f:
+                f.write(orjson.dumps([
+                    {'key': key, 'analysis': {k: v for k, v in asdict(analysis).items() if not k.startswith('_')}}
+                    for key, analysis in entries
+                ]))
+        except OSError as e:
+            self.logger.warning("Failed to persist semantic cache: %s", e)
+
+    def _build_payload(self, prompt: str, max_tokens: int, format_schema: Optional[Dict[str, Any]] = None) -> bytes:
+        """Build the encoded streaming chat request body for a prompt."""
+        options = {"num_predict": max_tokens, "top_p": 0.9}
+        if self.temperature is not None:
+            options["temperature"] = self.temperature
+        payload = self._payload_prefix + orjson.dumps(prompt) + b'}],"options":' + orjson.dumps(options)
+        if format_schema:
+            payload += b',"format":' + orjson.dumps(format_schema)
+        return payload + b'}'
+
+    def _call_ollama(self, prompt: str, max_tokens: int = _KEYWORD_TOKENS,
+                     format_schema: Optional[Dict[str, Any]] = None) -> str:
+        """Call Ollama API with the given prompt, serving repeated prompts from the cache.
+
+        Args:
+            prompt: Prompt sent as the user message
+            max_tokens: Upper bound on generated tokens (Ollama's num_predict)
+            format_schema: JSON schema the response must follow, None for free text
+        """
+        key = self._cache_key(prompt, max_tokens, format_schema)
+        content = self._cache_get(key)
+        if content is None:
+            content = self._request_ollama(prompt, max_tokens, format_schema)
+            self._cache_put(key, content)
+        return content
+
+    def _request_ollama(self, prompt: str, max_tokens: int = _KEYWORD_TOKENS,
+                        format_schema: Optional[Dict[str, Any]] = None) -> str:
+        """Send a chat request for the given prompt to the Ollama API.
+
+        Timeouts and connection errors are retried with exponential backoff.
+        """
+        payload = self._build_payload(prompt, max_tokens, format_schema)
+        for attempt in range(_MAX_ATTEMPTS):
+            try:
+                response = self.session.post(
+                    self._chat_url,
+                    data=payload,
+                    headers=_JSON_HEADERS,
+                    stream=True,
+                    timeout=30  # 30 second timeout between chunks
+                )
+                with response:
+                    response.raise_for_status()
+                    return self._accumulate_streaming_response(response)
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                if attempt < _MAX_ATTEMPTS - 1:
+                    delay = _BACKOFF_SECONDS * 2 ** attempt
+                    self.logger.warning("Ollama request failed (%s), retrying in %.1fs", e, delay)
+                    time.sleep(delay)
+                elif isinstance(e, requests.exceptions.Timeout):
+                    raise OllamaError("Ollama API request timed out")
+                else:
+                    raise OllamaError("Failed to connect to Ollama service")
+            except requests.exceptions.RequestException as e:
+                raise OllamaError(f"Ollama API request failed: {str(e)}")
+            except (KeyError, orjson.JSONDecodeError) as e:
+                raise OllamaError(f"Invalid response from Ollama: {str(e)}")
+
+    async def _acall_ollama(self, prompt: str, max_tokens: int = _KEYWORD_TOKENS) -> str:
+        """Async variant of _call_ollama sharing the same response cache."""
+        key = self._cache_key(prompt, max_tokens)
+        content = self._cache_get(key)
+        if content is None:
+            content = await self._arequest_ollama(prompt, max_tokens)
+            self._cache_put(key, content)
+        return content
+
+    async def _arequest_ollama(self, prompt: str, max_tokens: int = _KEYWORD_TOKENS) -> str:
+        """Send a streaming chat request with the service's httpx.AsyncClient."""
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(timeout=30)
+        payload = self._build_payload(prompt, max_tokens)
+        for attempt in range(_MAX_ATTEMPTS):
+            try:
+                async with self._async_client.stream(
+                    'POST', self._chat_url, content=payload, headers=_JSON_HEADERS
+                ) as response:
+                    response.raise_for_status()
+                    parts = []
+                    pending = ''
+                    async for line in response.aiter_lines():
+                        pending, done = self._accumulate_stream_line(parts, pending, line)
+                        if done:
+                            break
+                    return self._finish_stream(parts, pending)
+            except (httpx.TimeoutException, httpx.ConnectError) as e:
+                if attempt < _MAX_ATTEMPTS - 1:
+                    delay = _BACKOFF_SECONDS * 2 ** attempt
+                    self.logger.warning("Ollama request failed (%s), retrying in %.1fs", e, delay)
+                    await asyncio.sleep(delay)
+                elif isinstance(e, httpx.TimeoutException):
+                    raise OllamaError("Ollama API request timed out")
+                else:
+                    raise OllamaError("Failed to connect to Ollama service")
+            except httpx.HTTPError as e:
+                raise OllamaError(f"Ollama API request failed: {str(e)}")
+
+    async def aclose(self):
+        """Close the async HTTP client if one was opened."""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+    @staticmethod
+    def _validate_string_list(values: Any, min_items: int, name: str) -> List[str]:
+        """Validate that an LLM result is a list with at least min_items strings."""
+        if not isinstance(values, list):
+            raise ValidationError(f"Invalid {name} format")
+        values = [str(value).strip() for value in values if str(value).strip()]
+        if len(values) < min_items:
+            raise ValidationError(f"Insufficient {name} generated")
+        return values
+
+    @staticmethod
+    def _extract_json_array(text: str, min_items: int, name: str) -> List[Any]:
+        """
+        Extract a list from an LLM response.
+        
+        The first bracketed JSON array in the text is used when it parses and is
+        long enough, otherwise the response is split into one item per line.
+        
+        Args:
+            text: Raw LLM response
+            min_items: Minimum number of items required
+            name: Name of the list, used in error messages
+            
+        Returns:
+            Extracted list items
+            
+        Raises:
+            ValidationError: If fewer than min_items items are found
+        """
+        match = _JSON_ARRAY_RE.search(text)
+        if match:
+            try:
+                items = orjson.loads(match.group(0))
+                if isinstance(items, list) and len(items) >= min_items:
+                    return items
+            except orjson.JSONDecodeError:
+                pass
+        items = [line.strip(' -*"\',') for line in text.splitlines() if line.strip()]
+        items = [item for item in items if item]
+        if len(items) < min_items:
+            raise ValidationError(f"Insufficient {name} generated")
+        return items
+
+    def _call_for_list(self, prompt: str, max_tokens: int, schema: Dict[str, Any], min_items: int, name: str) -> List[Any]:
+        """Request a list, constrained by a JSON schema when structured outputs are enabled."""
+        if self._structured:
+            return self._validate_string_list(
+                orjson.loads(self._call_ollama(prompt, max_tokens, schema)), min_items, name
+            )
+        return self._extract_json_array(self._call_ollama(prompt, max_tokens), min_items, name)
+
+    @staticmethod
+    def _validate_style(style: Any) -> str:
+        """Normalize and validate a content style returned by the LLM."""
+        style = str(style).strip().lower()
+        if style not in _VALID_STYLES:
+            raise ValidationError(f"Invalid content style: {style}")
+        return style
+
+    @staticmethod
+    def _validate_platforms(platforms: Any) -> List[str]:
+        """Keep the supported platforms from an LLM result."""
+        if not isinstance(platforms, list):
+            raise ValidationError("Invalid platforms format")
+        platforms = [p for p in platforms if p in _VALID_PLATFORMS]
+        if not platforms:
+            raise ValidationError("No valid platforms selected")
+        return platforms
+
+    def _analyze_all(self, user_input: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Run the whole niche analysis in a single LLM call.
+        
+        Args:
+            user_input: Validated user input
+            
+        Returns:
+            Dictionary with main_topic, subtopics, keywords, content_style and target_platforms
+            
+        Raises:
+            OllamaError: If the Ollama call fails
+            ValidationError: If the response is not valid JSON or a field is invalid
+        """
+        return self._parse_analysis(self._call_ollama(self._analysis_prompt(user_input), _ANALYSIS_TOKENS))
+
+    def _analysis_prompt(self, user_input: Dict[str, Any]) -> str:
+        """Build the prompt asking for the whole niche analysis as one JSON object."""
+        return _ANALYSIS_PROMPT.format_map({
+            'topic': user_input.get('topic', ''),
+            'prefs': user_input.get('preferences', {})
+        })
+
+    @staticmethod
+    def _trim_json(response: str, opening: str, closing: str) -> str:
+        """Trim code fences or commentary around the outermost JSON object or array."""
+        start, end = response.find(opening), response.rfind(closing)
+        return response[start:end + 1] if 0 <= start < end else response
+
+    def _parse_analysis(self, response: str) -> Dict[str, Any]:
+        """Parse and validate the JSON object returned for the combined analysis prompt."""
+        try:
+            result = orjson.loads(self._trim_json(response, '{', '}'))
+        except orjson.JSONDecodeError as e:
+            raise ValidationError("Invalid combined analysis format", details=str(e))
+        return self._analysis_fields(result)
+
+    def _analysis_fields(self, result: Any) -> Dict[str, Any]:
+        """Validate one analysis object and return its NicheAnalysis fields."""
+        if not isinstance(result, dict):
+            raise ValidationError("Invalid combined analysis format")
+
+        main_topic = str(result.get('main_topic', '')).strip()
+        if not main_topic:
+            raise ValidationError("Failed to extract main topic")
+        return {
+            'main_topic': main_topic,
+            'subtopics': self._validate_string_list(result.get('subtopics'), 3, 'subtopics'),
+            'keywords': self._validate_string_list(result.get('keywords'), 5, 'keywords'),
+            'content_style': self._validate_style(result.get('content_style', '')),
+            'target_platforms': self._validate_platforms(result.get('target_platforms'))
+        }
+
+    def _parse_batch_analysis(self, response: str, count: int) -> List[Dict[str, Any]]:
+        """Parse and validate the JSON array returned for the batch analysis prompt."""
+        try:
+            results = orjson.loads(self._trim_json(response, '[', ']'))
+        except orjson.JSONDecodeError as e:
+            raise ValidationError("Invalid batch analysis format", details=str(e))
+        if not isinstance(results, list) or len(results) != count:
+            raise ValidationError("Batch analysis does not match the number of inputs")
+        return [self._analysis_fields(result) for result in results]
+
+    def _analyze_per_field(self, user_input: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Run the niche analysis with one prompt per field.
+        
+        Topic, style and platforms do not depend on each other and are requested
+        concurrently; subtopics need the topic and keywords need both.
+        
+        Args:
+            user_input: Validated user input
+            
+        Returns:
+            Dictionary with main_topic, subtopics, keywords, content_style and target_platforms
+        """
+        main_topic_future = self._executor.submit(self._extract_main_topic, user_input)
+        style_future = self._executor.submit(self._determine_content_style, user_input)
+        platforms_future = self._executor.submit(self._get_target_platforms, user_input)
+
+        try:
+            main_topic = main_topic_future.result()
+            # The dependent chain runs here while style and platforms are in flight
+            subtopics = self._generate_subtopics(main_topic)
+            keywords = self._generate_keywords(main_topic, subtopics)
+            return {
+                'main_topic': main_topic,
+                'subtopics': subtopics,
+                'keywords': keywords,
+                'content_style': style_future.result(),
+                'target_platforms': platforms_future.result()
+            }
+        finally:
+            # Do not leave calls running for an analysis that already failed
+            style_future.cancel()
+            platforms_future.cancel()
+
+    def _accumulate_stream_line(self, parts: List[str], pending: str, line: str) -> Tuple[str, bool]:
+        """
+        Add one NDJSON line of a streamed Ollama response to the collected parts.
+        
+        Lines that do not parse on their own are treated as a partial chunk and
+        joined with the following line before parsing again.
+        
+        Args:
+            parts: Content collected so far, appended to in place
+            pending: Unparsed text carried over from previous lines
+            line: Next line of the response
+            
+        Returns:
+            Tuple of the text still pending and whether the final chunk was seen
+        """
+        if not line:
+            return pending, False
+        pending += line
+        try:
+            chunk = orjson.loads(pending)
+        except orjson.JSONDecodeError:
+            return pending, False
+
+        if 'error' in chunk:
+            raise OllamaError(f"Ollama API request failed: {chunk['error']}")
+        parts.append(chunk.get('message', {}).get('content') or chunk.get('response', ''))
+        return '', bool(chunk.get('done'))
+
+    def _finish_stream(self, parts: List[str], pending: str) -> str:
+        """Join the collected stream content, rejecting a truncated final chunk."""
+        if pending:
+            raise OllamaError("Invalid response from Ollama: incomplete stream chunk")
+        return ''.join(parts)
+
+    def _accumulate_streaming_response(self, response: requests.Response) -> str:
+        """
+        Join the content of a streamed NDJSON Ollama response.
+        
+        Args:
+            response: Streaming response from the Ollama chat API
+            
+        Returns:
+            The full generated text
+        """
+        parts = []
+        pending = ''
+        for line in response.iter_lines(decode_unicode=True):
+            pending, done = self._accumulate_stream_line(parts, pending, line)
+            if done:
+                break
+        return self._finish_stream(parts, pending)
 
     def _extract_main_topic(self, user_input: Dict[str, Any]) -> str:
         """Extract the main topic from user input using LLM."""
         try:
-            prompt = f"""
-            Analyze the following user input and extract the main topic. 
-            Return only the main topic, nothing else.
-            
-            User Input: {user_input.get('topic', '')}
-            Preferences: {user_input.get('preferences', {})}
-            """
-            topic = self._call_ollama(prompt).strip()
+            prompt = _TOPIC_PROMPT.format_map({
+                'topic': user_input.get('topic', ''),
+                'prefs': user_input.get('preferences', {})
+            })
+            topic = self._call_ollama(prompt, _WORD_TOKENS).strip()
             if not topic:
                 raise ValidationError("Failed to extract main topic")
             return topic
@@ -136,97 +758,49 @@ class NicheAnalysisService:
     def _generate_subtopics(self, main_topic: str) -> List[str]:
         """Generate relevant subtopics for the main topic using LLM."""
         try:
-            prompt = f"""
-            Generate 3-5 relevant subtopics for the main topic: {main_topic}
-            Return the subtopics as a JSON array of strings.
-            """
-            response = self._call_ollama(prompt)
-            try:
-                subtopics = json.loads(response)
-                if not isinstance(subtopics, list) or len(subtopics) < 3:
-                    raise ValidationError("Invalid subtopics format")
-                return subtopics
-            except json.JSONDecodeError:
-                # Fallback if JSON parsing fails
-                subtopics = [line.strip() for line in response.split('\n') if line.strip()]
-                if len(subtopics) < 3:
-                    raise ValidationError("Insufficient subtopics generated")
-                return subtopics
+            prompt = _SUBTOPICS_PROMPT.format_map({'topic': main_topic})
+            return self._call_for_list(prompt, _LIST_TOKENS, _SUBTOPICS_SCHEMA, 3, 'subtopics')
         except Exception as e:
             raise NicheAnalysisError("Failed to generate subtopics", details=str(e))
 
-    def _generate_keywords(self, main_topic: str, subtopics: List[str]) -> List[str]:
-        """Generate SEO keywords based on topic and subtopics using LLM."""
+    def _generate_keywords(self, main_topic: str, subtopics: List[str], subtopics_str: Optional[str] = None) -> List[str]:
+        """Generate SEO keywords based on topic and subtopics using LLM, reusing subtopics_str if already joined."""
         try:
-            prompt = f"""
-            Generate 5-10 SEO keywords for the following topic and subtopics.
-            Return the keywords as a JSON array of strings.
-            
-            Main Topic: {main_topic}
-            Subtopics: {', '.join(subtopics)}
-            """
-            response = self._call_ollama(prompt)
-            try:
-                keywords = json.loads(response)
-                if not isinstance(keywords, list) or len(keywords) < 5:
-                    raise ValidationError("Invalid keywords format")
-                return keywords
-            except json.JSONDecodeError:
-                # Fallback if JSON parsing fails
-                keywords = [line.strip() for line in response.split('\n') if line.strip()]
-                if len(keywords) < 5:
-                    raise ValidationError("Insufficient keywords generated")
-                return keywords
+            prompt = _KEYWORDS_PROMPT.format_map({
+                'topic': main_topic,
+                'subtopics': subtopics_str if subtopics_str is not None else ', '.join(subtopics)
+            })
+            return self._call_for_list(prompt, _KEYWORD_TOKENS, _KEYWORDS_SCHEMA, 5, 'keywords')
         except Exception as e:
             raise NicheAnalysisError("Failed to generate keywords", details=str(e))
 
     def _determine_content_style(self, user_input: Dict[str, Any]) -> str:
         """Determine the appropriate content style using LLM."""
         try:
-            prompt = f"""
-            Analyze the following user preferences and determine the most appropriate content style.
-            Choose from: professional, casual, technical, academic, or conversational.
-            Return only the style, nothing else.
-            
-            Preferences: {user_input.get('preferences', {})}
-            """
-            style = self._call_ollama(prompt).strip().lower()
-            valid_styles = ['professional', 'casual', 'technical', 'academic', 'conversational']
-            if style not in valid_styles:
-                raise ValidationError(f"Invalid content style: {style}")
-            return style
+            prompt = _STYLE_PROMPT.format_map({'prefs': user_input.get('preferences', {})})
+            return self._validate_style(self._call_ollama(prompt, _WORD_TOKENS))
         except Exception as e:
             raise NicheAnalysisError("Failed to determine content style", details=str(e))
 
     def _get_target_platforms(self, user_input: Dict[str, Any]) -> List[str]:
         """Get target platforms from user input using LLM."""
         try:
-            prompt = f"""
-            Analyze the following user preferences and determine the most appropriate platforms.
-            Choose from: twitter, linkedin, medium, github.
-            Return the platforms as a JSON array of strings.
-            
-            Preferences: {user_input.get('preferences', {})}
-            """
-            response = self._call_ollama(prompt)
+            prompt = _PLATFORMS_PROMPT.format_map({'prefs': user_input.get('preferences', {})})
             try:
-                platforms = json.loads(response)
-                valid_platforms = ['twitter', 'linkedin', 'medium', 'github']
-                platforms = [p for p in platforms if p in valid_platforms]
-                if not platforms:
-                    raise ValidationError("No valid platforms selected")
-                return platforms
-            except json.JSONDecodeError:
-                return ['twitter']  # Default to Twitter if parsing fails
+                platforms = self._call_for_list(prompt, _LIST_TOKENS, _PLATFORMS_SCHEMA, 1, 'platforms')
+            except ValidationError:
+                return ['twitter']  # Default to Twitter if nothing can be parsed
+            return self._validate_platforms(platforms)
         except Exception as e:
             raise NicheAnalysisError("Failed to determine target platforms", details=str(e))
 
-    def analyze_niche(self, user_input: Dict[str, Any]) -> NicheAnalysis:
+    def analyze_niche(self, user_input: Dict[str, Any], _skip_validation: bool = False) -> NicheAnalysis:
         """
         Analyze user input to determine niche, topics, and content requirements.
         
         Args:
             user_input: Dictionary containing user preferences and requirements
+            _skip_validation: Skip input validation for dicts built internally with all fields set
             
         Returns:
             NicheAnalysis object containing analyzed information
@@ -237,49 +811,142 @@ class NicheAnalysisService:
         """
         try:
             self.logger.info("Starting niche analysis")
-            self.logger.info(f"Input type: {type(user_input)}")
-            self.logger.info(f"Input content: {user_input}")
+            self.logger.debug("Input content: %s", user_input)
             
             # Validate input
-            self._validate_user_input(user_input)
+            if not _skip_validation:
+                self._validate_user_input(user_input)
             
-            # Extract main topic
-            main_topic = self._extract_main_topic(user_input)
-            self.logger.info(f"Main topic: {main_topic}")
+            # Reuse the analysis of a similar topic with the same preferences
+            embedding, cached = self._semantic_lookup(user_input)
+            if cached is not None:
+                self.logger.info("Reusing cached analysis for similar topic: %s", cached.main_topic)
+                return cached
             
-            # Generate subtopics
-            subtopics = self._generate_subtopics(main_topic)
-            self.logger.info(f"Generated subtopics: {subtopics}")
+            # Run the whole analysis in one LLM call
+            try:
+                fields = self._analyze_all(user_input)
+            except ValidationError as e:
+                # Fall back to one prompt per field if the combined JSON is unusable
+                self.logger.warning("Combined analysis invalid, using per-field prompts: %s", e)
+                fields = self._analyze_per_field(user_input)
+            self.logger.debug("Analysis fields: %s", fields)
             
-            # Generate keywords
-            keywords = self._generate_keywords(main_topic, subtopics)
-            self.logger.info(f"Generated keywords: {keywords}")
+            # Create and return analysis
+            analysis = NicheAnalysis(**fields, generated_at=datetime.now())
+            self._semantic_store(embedding, user_input, analysis)
+            self.logger.info("Analysis completed: %s", analysis)
+            return analysis
+            
+        except ValidationError as e:
+            self.logger.error("Validation error: %s", e)
+            raise
+        except Exception as e:
+            self.logger.error("Analysis error: %s", e)
+            raise NicheAnalysisError(f"Failed to analyze niche: {str(e)}")
+
+    def analyze_niches_batch(self, inputs: List[Dict[str, Any]], _skip_validation: bool = False) -> List[NicheAnalysis]:
+        """
+        Analyze several user inputs with a single LLM call.
+        
+        Inputs with a semantically cached analysis are not sent. If the combined
+        response cannot be used, each remaining input is analyzed on its own.
+        
+        Args:
+            inputs: User inputs, each as accepted by analyze_niche
+            _skip_validation: Skip input validation for dicts built internally with all fields set
             
-            # Determine content style
-            content_style = self._determine_content_style(user_input)
-            self.logger.info(f"Content style: {content_style}")
+        Returns:
+            One NicheAnalysis per input, in input order
             
-            # Get target platforms
-            target_platforms = self._get_target_platforms(user_input)
-            self.logger.info(f"Target platforms: {target_platforms}")
+        Raises:
+            ValidationError: If input validation fails
+            NicheAnalysisError: If analysis fails
+        """
+        try:
+            if not _skip_validation:
+                for user_input in inputs:
+                    self._validate_user_input(user_input)
             
-            # Create and return analysis
-            analysis = NicheAnalysis(
-                main_topic=main_topic,
-                subtopics=subtopics,
-                keywords=keywords,
-                content_style=content_style,
-                target_platforms=target_platforms,
-                generated_at=datetime.now()
-            )
-            self.logger.info(f"Analysis completed: {analysis}")
+            analyses: List[Optional[NicheAnalysis]] = [None] * len(inputs)
+            embeddings = [None] * len(inputs)
+            for index, user_input in enumerate(inputs):
+                embeddings[index], analyses[index] = self._semantic_lookup(user_input)
+            pending = [index for index, analysis in enumerate(analyses) if analysis is None]
+            if not pending:
+                return analyses
+            
+            try:
+                prompt = _BATCH_ANALYSIS_PROMPT.format_map({
+                    'count': len(pending),
+                    'inputs': orjson.dumps([
+                        {'topic': inputs[index].get('topic', ''), 'preferences': inputs[index].get('preferences', {})}
+                        for index in pending
+                    ]).decode()
+                })
+                response = self._call_ollama(prompt, _ANALYSIS_TOKENS * len(pending))
+                results = self._parse_batch_analysis(response, len(pending))
+            except ValidationError as e:
+                self.logger.warning("Batch analysis invalid, analyzing %d inputs one by one: %s", len(pending), e)
+                for index in pending:
+                    analyses[index] = self.analyze_niche(inputs[index], _skip_validation=True)
+                return analyses
+            
+            now = datetime.now()
+            for index, fields in zip(pending, results):
+                analyses[index] = NicheAnalysis(**fields, generated_at=now)
+                self._semantic_store(embeddings[index], inputs[index], analyses[index])
+            self.logger.info("Batch analysis completed for %d inputs", len(inputs))
+            return analyses
+            
+        except (ValidationError, NicheAnalysisError):
+            raise
+        except Exception as e:
+            self.logger.error("Batch analysis error: %s", e)
+            raise NicheAnalysisError(f"Failed to analyze niches: {str(e)}")
+
+    async def analyze_niche_async(self, user_input: Dict[str, Any], _skip_validation: bool = False) -> NicheAnalysis:
+        """
+        Async variant of analyze_niche using httpx.AsyncClient for the combined prompt.
+        
+        Args:
+            user_input: Dictionary containing user preferences and requirements
+            _skip_validation: Skip input validation for dicts built internally with all fields set
+            
+        Returns:
+            NicheAnalysis object containing analyzed information
+            
+        Raises:
+            ValidationError: If input validation fails
+            NicheAnalysisError: If analysis fails
+        """
+        try:
+            if not _skip_validation:
+                self._validate_user_input(user_input)
+            
+            embedding, cached = await asyncio.to_thread(self._semantic_lookup, user_input)
+            if cached is not None:
+                self.logger.info("Reusing cached analysis for similar topic: %s", cached.main_topic)
+                return cached
+            
+            try:
+                response = await self._acall_ollama(self._analysis_prompt(user_input), _ANALYSIS_TOKENS)
+                fields = self._parse_analysis(response)
+            except ValidationError as e:
+                # The per-field fallback is thread based, keep it off the event loop
+                self.logger.warning("Combined analysis invalid, using per-field prompts: %s", e)
+                fields = await asyncio.to_thread(self._analyze_per_field, user_input)
+            
+            analysis = NicheAnalysis(**fields, generated_at=datetime.now())
+            self._semantic_store(embedding, user_input, analysis)
+            self.logger.info("Analysis completed: %s", analysis)
             return analysis
             
         except ValidationError as e:
-            self.logger.error(f"Validation error: {str(e)}")
+            self.logger.error("Validation error: %s", e)
             raise
         except Exception as e:
-            self.logger.error(f"Analysis error: {str(e)}")
+            self.logger.error("Analysis error: %s", e)
             raise NicheAnalysisError(f"Failed to analyze niche: {str(e)}")
 
     def update_analysis(self, analysis: NicheAnalysis, new_data: Dict[str, Any]) -> NicheAnalysis:
@@ -305,7 +972,10 @@ class NicheAnalysisService:
             if 'topic' in new_data:
                 analysis.main_topic = self._extract_main_topic(new_data)
                 analysis.subtopics = self._generate_subtopics(analysis.main_topic)
-                analysis.keywords = self._generate_keywords(analysis.main_topic, analysis.subtopics)
+                analysis._subtopics_str = ', '.join(analysis.subtopics)
+                analysis.keywords = self._generate_keywords(
+                    analysis.main_topic, analysis.subtopics, analysis._subtopics_str
+                )
             
             # Update content style if provided
             if 'style' in new_data:
@@ -315,10 +985,11 @@ class NicheAnalysisService:
             if 'platforms' in new_data:
                 analysis.target_platforms = self._get_target_platforms(new_data)
             
+            analysis.generated_at = datetime.now()
             return analysis
             
         except ValidationError:
             raise
         except Exception as e:
-            self.logger.error(f"Error updating niche analysis: {str(e)}", exc_info=True)
+            self.logger.error("Error updating niche analysis: %s", e, exc_info=True)
             raise NicheAnalysisError("Failed to update niche analysis", details=str(e)) 
\ No newline at end of file
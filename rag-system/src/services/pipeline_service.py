@@ -1,21 +1,156 @@
-from typing import Dict, Any, List
+import asyncio
+from typing import Dict, Any, List, Optional
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from .niche_analysis_service import NicheAnalysisService, NicheAnalysis
 from .resource_collection_service import ResourceCollectionService
-from .rag_service import RAGService
+from .rag_service import get_rag_service
 from dataclasses import dataclass
+from pymongo import MongoClient
+import requests
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Metrics of a freshly generated post, copied into each result
+_EMPTY_METRICS = {"views": 0, "likes": 0, "shares": 0, "comments": 0}
+
+# Upper bound on concurrent content generations in a batch
+_BATCH_WORKERS = 8
+
+# Process-wide pipeline, see get_pipeline_service
+_pipeline_service: Optional["PipelineService"] = None
+_pipeline_lock = threading.Lock()
+
 class PipelineService:
-    def __init__(self):
-        self.niche_service = NicheAnalysisService()
+    def __init__(self, session: Optional[requests.Session] = None, mongo_client: Optional[MongoClient] = None):
+        """
+        Initialize the pipeline and its services.
+        
+        Args:
+            session: HTTP session shared by all Ollama calls
+            mongo_client: MongoDB client to reuse instead of opening a new one
+        """
+        self.niche_service = NicheAnalysisService(session=session)
         self.resource_service = ResourceCollectionService()
-        self.rag_service = RAGService()
+        self.rag_service = get_rag_service(mongo_client=mongo_client, session=session)
         
+    def _store_account(self, account_id: str):
+        """Store the account, logging instead of failing if it cannot be stored."""
+        try:
+            self.rag_service.store_account(account_id)
+            logger.info("Account %s stored successfully", account_id)
+        except Exception as e:
+            logger.warning("Failed to store account: %s", e)
+
+    def _niche_input(self, topic: str, query: str, platform: str, content_style: str) -> Dict[str, Any]:
+        """Format request fields as niche analysis input."""
+        return {
+            'topic': topic,
+            'preferences': {
+                'platform': platform,
+                'style': content_style,
+                'query_context': query
+            }
+        }
+
+    def _fallback_analysis(self, topic: str, platform: str, now: datetime) -> NicheAnalysis:
+        """Create a simple analysis without LLM."""
+        analysis = NicheAnalysis(
+            main_topic=topic,
+            subtopics=[topic],
+            keywords=[topic.lower()],
+            content_style='professional',
+            target_platforms=[platform],
+            generated_at=now
+        )
+        logger.info("Created fallback analysis")
+        return analysis
+
+    def _store_preferences(self, account_id: str, analysis: NicheAnalysis, now: datetime) -> str:
+        """Store the analysis as account preferences and return the preference ID."""
+        try:
+            preferences_data = {
+                'niche': analysis.main_topic,
+                'subtopics': analysis.subtopics,
+                'keywords': analysis.keywords,
+                'style': analysis.content_style,
+                'platforms': analysis.target_platforms
+            }
+            logger.debug("Storing preferences: %s", preferences_data)
+            preference_id = self.rag_service.store_preferences(
+                account_id=account_id,
+                preferences=preferences_data
+            )
+            logger.info("Preferences stored with ID: %s", preference_id)
+            return preference_id
+        except Exception as e:
+            logger.error("Failed to store preferences: %s", e, exc_info=True)
+            return f"error_{now.timestamp()}"
+
+    def _generate_content(self, topic: str, query: str, platform: str, analysis: NicheAnalysis) -> str:
+        """Generate content for the platform, falling back to a simple template."""
+        try:
+            if platform == "twitter":
+                logger.info("Generating Twitter post with style: %s", analysis.content_style)
+                result = self.rag_service.create_twitter_post(
+                    content=query,
+                    style=analysis.content_style
+                )
+                content = result.get('content', query)
+            else:
+                logger.info("Generating content for platform: %s", platform)
+                content = self.rag_service.generate_with_context(
+                    context=query,
+                    query=query
+                )
+            logger.info("Content generated successfully")
+            return content
+        except Exception as e:
+            logger.error("Content generation failed: %s", e, exc_info=True)
+            # Use a simple content generation fallback
+            logger.info("Created fallback content")
+            return f"Here's what you need to know about {topic}: {query}"
+
+    def _store_post(self, account_id: str, content: str, platform: str, preference_id: str, analysis: NicheAnalysis, now: datetime) -> str:
+        """Store the generated post and return its ID."""
+        try:
+            post_metadata = {
+                'preference_id': preference_id,
+                'style': analysis.content_style,
+                'generated_at': now.isoformat(),
+                'platform_specific': {
+                    'character_count': len(content)
+                }
+            }
+            logger.debug("Storing post with metadata: %s", post_metadata)
+            post_id = self.rag_service.store_post(
+                account_id=account_id,
+                resource_id=None,  # No resource for now
+                content=content,
+                platform=platform,
+                metadata=post_metadata
+            )
+            logger.info("Post stored with ID: %s", post_id)
+            return post_id
+        except Exception as e:
+            logger.error("Failed to store post: %s", e, exc_info=True)
+            return f"error_{now.timestamp()}"
+
+    def _build_result(self, account_id: str, post_id: str, content: str, platform: str, now: datetime) -> Dict[str, Any]:
+        """Build the response returned for a content request."""
+        result = {
+            "account_id": account_id,
+            "post_id": post_id,
+            "content": content,
+            "platform": platform,
+            "generated_at": now.isoformat(),
+            "performance_metrics": _EMPTY_METRICS.copy()
+        }
+        logger.debug("Returning result: %s", result)
+        return result
+
     def process_content_request(self, account_id: str, topic: str, query: str, platform: str = "twitter", content_style: str = "professional") -> Dict[str, Any]:
         """
         Process a content generation request through the full pipeline.
@@ -31,129 +166,178 @@ class PipelineService:
             Dict containing the generated content and metadata
         """
         try:
-            logger.info(f"Starting content request processing with inputs: account_id={account_id}, topic={topic}, query={query}, platform={platform}, content_style={content_style}")
+            logger.info("Starting content request processing with inputs: account_id=%s, topic=%s, query=%s, platform=%s, content_style=%s", account_id, topic, query, platform, content_style)
             
-            # Step 1: Store account if not exists
-            try:
-                self.rag_service.store_account(account_id)
-                logger.info(f"Account {account_id} stored successfully")
-            except Exception as e:
-                logger.warning(f"Failed to store account: {str(e)}")
-            
-            # Step 2: Analyze niche and store preferences
-            logger.info(f"Analyzing niche for account {account_id}")
-            
-            # Format input for niche analysis
-            niche_input = {
-                'topic': topic,
-                'preferences': {
-                    'platform': platform,
-                    'style': content_style,
-                    'query_context': query
-                }
-            }
+            # One timestamp for every record of this request
+            now = datetime.now()
             
-            logger.info(f"Niche input type: {type(niche_input)}")
-            logger.info(f"Niche input content: {niche_input}")
+            # Step 1: Store account if not exists
+            self._store_account(account_id)
             
+            # Step 2: Analyze niche
+            logger.info("Analyzing niche for account %s", account_id)
+            niche_input = self._niche_input(topic, query, platform, content_style)
+            logger.debug("Niche input content: %s", niche_input)
             try:
-                logger.info("Calling analyze_niche with input")
-                analysis: NicheAnalysis = self.niche_service.analyze_niche(niche_input)
+                analysis: NicheAnalysis = self.niche_service.analyze_niche(niche_input, _skip_validation=True)
                 logger.info("Niche analysis completed successfully")
             except Exception as e:
-                logger.error(f"Niche analysis failed with input {niche_input}: {str(e)}", exc_info=True)
-                # Create a simple analysis without LLM
-                analysis = NicheAnalysis(
-                    main_topic=topic,
-                    subtopics=[topic],
-                    keywords=[topic.lower()],
-                    content_style='professional',
-                    target_platforms=[platform],
-                    generated_at=datetime.now()
-                )
-                logger.info("Created fallback analysis")
+                logger.error("Niche analysis failed with input %s: %s", niche_input, e, exc_info=True)
+                analysis = self._fallback_analysis(topic, platform, now)
             
             # Step 3: Store preferences
-            try:
-                preferences_data = {
-                    'niche': analysis.main_topic,
-                    'subtopics': analysis.subtopics,
-                    'keywords': analysis.keywords,
-                    'style': analysis.content_style,
-                    'platforms': analysis.target_platforms
-                }
-                logger.info(f"Storing preferences: {preferences_data}")
-                preference_id = self.rag_service.store_preferences(
-                    account_id=account_id,
-                    preferences=preferences_data
-                )
-                logger.info(f"Preferences stored with ID: {preference_id}")
-            except Exception as e:
-                logger.error(f"Failed to store preferences: {str(e)}", exc_info=True)
-                preference_id = f"error_{datetime.now().timestamp()}"
+            preference_id = self._store_preferences(account_id, analysis, now)
             
             # Step 4: Generate content
-            logger.info(f"Generating content for account {account_id}")
-            try:
-                if platform == "twitter":
-                    logger.info(f"Generating Twitter post with style: {analysis.content_style}")
-                    result = self.rag_service.create_twitter_post(
-                        content=query,
-                        style=analysis.content_style
-                    )
-                    content = result.get('content', query)
-                else:
-                    logger.info(f"Generating content for platform: {platform}")
-                    content = self.rag_service.generate_with_context(
-                        context=query,
-                        query=query
-                    )
-                logger.info("Content generated successfully")
-            except Exception as e:
-                logger.error(f"Content generation failed: {str(e)}", exc_info=True)
-                # Use a simple content generation fallback
-                content = f"Here's what you need to know about {topic}: {query}"
-                logger.info("Created fallback content")
+            logger.info("Generating content for account %s", account_id)
+            content = self._generate_content(topic, query, platform, analysis)
             
             # Step 5: Store the post
-            try:
-                post_metadata = {
-                    'preference_id': preference_id,
-                    'style': analysis.content_style,
-                    'generated_at': datetime.now().isoformat(),
-                    'platform_specific': {
-                        'character_count': len(content)
-                    }
-                }
-                logger.info(f"Storing post with metadata: {post_metadata}")
-                post_id = self.rag_service.store_post(
-                    account_id=account_id,
-                    resource_id=None,  # No resource for now
-                    content=content,
-                    platform=platform,
-                    metadata=post_metadata
-                )
-                logger.info(f"Post stored with ID: {post_id}")
-            except Exception as e:
-                logger.error(f"Failed to store post: {str(e)}", exc_info=True)
-                post_id = f"error_{datetime.now().timestamp()}"
-            
-            result = {
-                "account_id": account_id,
-                "post_id": post_id,
-                "content": content,
-                "platform": platform,
-                "generated_at": datetime.now().isoformat(),
-                "performance_metrics": {
-                    "views": 0,
-                    "likes": 0,
-                    "shares": 0,
-                    "comments": 0
-                }
-            }
-            logger.info(f"Returning result: {result}")
-            return result
+            post_id = self._store_post(account_id, content, platform, preference_id, analysis, now)
+            
+            return self._build_result(account_id, post_id, content, platform, now)
             
         except Exception as e:
-            logger.error(f"Error in pipeline processing: {str(e)}", exc_info=True)
-            raise Exception(f"Pipeline processing failed: {str(e)}") 
\ No newline at end of file
+            logger.error("Error in pipeline processing: %s", e, exc_info=True)
+            raise Exception(f"Pipeline processing failed: {str(e)}")
+
+    async def process_content_request_async(self, account_id: str, topic: str, query: str, platform: str = "twitter", content_style: str = "professional") -> Dict[str, Any]:
+        """
+        Async variant of process_content_request.
+        
+        Niche analysis runs on the async Ollama client, and storing preferences
+        and generating content, which both only need the analysis, run
+        concurrently. Blocking MongoDB and Ollama calls run in worker threads.
+        
+        Args:
+            account_id: The account ID
+            topic: The main topic
+            query: The specific query for content generation
+            platform: The target platform (default: twitter)
+            content_style: The content style (default: professional)
+            
+        Returns:
+            Dict containing the generated content and metadata
+        """
+        try:
+            logger.info("Starting async content request processing for account %s", account_id)
+            now = datetime.now()
+            niche_input = self._niche_input(topic, query, platform, content_style)
+            
+            # Storing the account and analyzing the niche are independent
+            _, analysis = await asyncio.gather(
+                asyncio.to_thread(self._store_account, account_id),
+                self.niche_service.analyze_niche_async(niche_input, _skip_validation=True),
+                return_exceptions=True
+            )
+            if isinstance(analysis, BaseException):
+                logger.error("Niche analysis failed with input %s: %s", niche_input, analysis)
+                analysis = self._fallback_analysis(topic, platform, now)
+            
+            preference_id, content = await asyncio.gather(
+                asyncio.to_thread(self._store_preferences, account_id, analysis, now),
+                asyncio.to_thread(self._generate_content, topic, query, platform, analysis)
+            )
+            
+            post_id = await asyncio.to_thread(self._store_post, account_id, content, platform, preference_id, analysis, now)
+            return self._build_result(account_id, post_id, content, platform, now)
+            
+        except Exception as e:
+            logger.error("Error in pipeline processing: %s", e, exc_info=True)
+            raise Exception(f"Pipeline processing failed: {str(e)}")
+
+    def process_content_requests_batch(self, content_requests: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Process several content requests, analyzing all niches in one LLM call.
+        
+        Content for the requests is then generated and stored concurrently on a
+        bounded thread pool.
+        
+        Args:
+            content_requests: Requests with account_id, topic and query, and optionally
+                platform and content_style, as for process_content_request
+            
+        Returns:
+            One result dict per request, in request order
+        """
+        try:
+            logger.info("Starting batch content request processing for %d requests", len(content_requests))
+            if not content_requests:
+                return []
+            now = datetime.now()
+            content_requests = [
+                {'platform': 'twitter', 'content_style': 'professional', **request}
+                for request in content_requests
+            ]
+            niche_inputs = [
+                self._niche_input(r['topic'], r['query'], r['platform'], r['content_style'])
+                for r in content_requests
+            ]
+            
+            with ThreadPoolExecutor(max_workers=min(_BATCH_WORKERS, len(content_requests))) as executor:
+                # Storing accounts does not depend on the analyses
+                stored = [executor.submit(self._store_account, r['account_id']) for r in content_requests]
+                try:
+                    analyses = self.niche_service.analyze_niches_batch(niche_inputs, _skip_validation=True)
+                except Exception as e:
+                    logger.error("Batch niche analysis failed: %s", e, exc_info=True)
+                    analyses = [self._fallback_analysis(r['topic'], r['platform'], now) for r in content_requests]
+                for future in stored:
+                    future.result()
+                
+                return list(executor.map(
+                    lambda r, analysis: self._complete_request(r, analysis, now),
+                    content_requests, analyses
+                ))
+            
+        except Exception as e:
+            logger.error("Error in batch pipeline processing: %s", e, exc_info=True)
+            raise Exception(f"Pipeline processing failed: {str(e)}")
+
+    def _complete_request(self, request: Dict[str, Any], analysis: NicheAnalysis, now: datetime) -> Dict[str, Any]:
+        """Run the steps after niche analysis for one request of a batch."""
+        account_id, platform = request['account_id'], request['platform']
+        preference_id = self._store_preferences(account_id, analysis, now)
+        content = self._generate_content(request['topic'], request['query'], platform, analysis)
+        post_id = self._store_post(account_id, content, platform, preference_id, analysis, now)
+        return self._build_result(account_id, post_id, content, platform, now)
+
+    def collect_resources(self, account_id: str, analysis: NicheAnalysis, limit: int = 10) -> List[str]:
+        """
+        Collect resources for an analysis and store them in one bulk write.
+        
+        Args:
+            account_id: The account the resources are collected for
+            analysis: Niche analysis driving the collection
+            limit: Maximum number of resources to collect per type
+            
+        Returns:
+            IDs of the stored resources
+        """
+        resources = self.resource_service.collect_resources(analysis, limit)
+        return self.rag_service.store_resources_bulk(account_id, [
+            {
+                'content': resource.content,
+                'metadata': {**resource.metadata, 'resource_type': resource.resource_type},
+                'keywords': resource.keywords
+            }
+            for resource in resources
+        ])
+
+def get_pipeline_service(session: Optional[requests.Session] = None, mongo_client: Optional[MongoClient] = None) -> PipelineService:
+    """
+    Return the process-wide PipelineService, creating it on first use.
+    
+    Args:
+        session: HTTP session for the pipeline, only used when it is created
+        mongo_client: MongoDB client for the pipeline, only used when it is created
+        
+    Returns:
+        The shared PipelineService
+    """
+    global _pipeline_service
+    if _pipeline_service is None:
+        with _pipeline_lock:
+            if _pipeline_service is None:
+                _pipeline_service = PipelineService(session=session, mongo_client=mongo_client)
+    return _pipeline_service
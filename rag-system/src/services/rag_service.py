@@ -1,154 +1,376 @@
 import os
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator, Tuple
 from pymongo import MongoClient
+from pymongo.write_concern import WriteConcern
+from bson.binary import Binary, BinaryVectorDtype
 from dotenv import load_dotenv
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
+import orjson
 from datetime import datetime
 import pymongo
 import logging
+import numpy as np
+import hashlib
+import time
+import uuid
+import threading
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
 
 load_dotenv()
 
-class RAGService:
-    def __init__(self):
-        self.logger = logging.getLogger(__name__)
-        try:
-            # Initialize MongoDB connection
-            self.mongo_client = MongoClient(os.getenv('MONGO_URI', 'mongodb://localhost:27017'))
-            self.db = self.mongo_client[os.getenv('DB_NAME', 'llm_papers')]
-            
-            # Collections for different data types
-            self.accounts = self.db.accounts
-            self.preferences = self.db.preferences
-            self.resources = self.db.resources
-            self.posts = self.db.posts
-            
-            # Test MongoDB connection
-            self.mongo_client.server_info()
-            
-            # Ollama configuration
-            self.ollama_host = os.getenv('OLLAMA_HOST', 'http://localhost:11434')
-            self.model_name = os.getenv('MODEL_NAME', 'gemma:7b')
-            
-            # Set up MongoDB methods
-            self._setup_mongodb_methods()
-            
-        except Exception as e:
-            print(f"Warning: MongoDB connection failed - {str(e)}")
-            print("Using in-memory storage for testing")
-            self._setup_inmemory_storage()
+# Pool and timeout defaults for the shared MongoDB client, options set in the URI win
+_MONGO_CLIENT_OPTIONS = {
+    'maxPoolSize': 50,
+    'minPoolSize': 5,
+    'waitQueueTimeoutMS': 2000,
+    'serverSelectionTimeoutMS': 3000,
+    'socketTimeoutMS': 15000,
+    'compressors': 'zlib',
+    'retryWrites': True
+}
+
+# Process-wide service, see get_rag_service
+_rag_service: Optional["RAGService"] = None
+_rag_lock = threading.Lock()
+
+# Connect and read timeouts for Ollama requests
+_OLLAMA_TIMEOUT = (3, 60)
+
+# Ollama request bodies are serialized with orjson and sent as raw bytes
+_JSON_HEADERS = {'Content-Type': 'application/json'}
+
+# Prompt templates, filled in with str.format_map
+_CONTEXT_SYSTEM_PROMPT = """You are a helpful assistant. Use the following context to answer the user's question:
+
+{context}
+
+Please provide a detailed and accurate response based on the context above."""
+
+_TWEET_SYSTEM_PROMPT = "You are a professional content creator."
+
+_TWEET_PROMPT = """Generate a {style} tweet about this content:
+
+{content}
+
+IMPORTANT FORMATTING RULES:
+1. ABSOLUTELY NO EMOJIS OR SPECIAL CHARACTERS
+2. Use plain text only
+3. Maximum 230 characters
+4. Must be informative and technical but accessible
+5. Include key points
+6. Use hashtags sparingly (max 2-3)
+7. DO NOT include any URLs in the generated text"""
+
+def create_mongo_client(uri: Optional[str] = None) -> MongoClient:
+    """
+    Create a MongoClient with a tuned connection pool.
     
-    def _setup_mongodb_methods(self):
-        """Set up MongoDB methods."""
-        def store_account(account_id: str) -> str:
-            account_data = {
-                'account_id': account_id,
-                'created_at': datetime.now()
-            }
-            result = self.accounts.insert_one(account_data)
-            return str(result.inserted_id)
+    Args:
+        uri: MongoDB connection string, defaults to MONGO_URI
         
-        def store_preferences(account_id: str, preferences: Dict[str, Any]) -> str:
-            preference_data = {
-                'account_id': account_id,
-                'preference_id': f"pref_{datetime.now().timestamp()}",
-                'niche': preferences.get('niche'),
-                'subtopics': preferences.get('subtopics', []),
-                'generated_keywords': preferences.get('keywords', []),
-                'content_style': preferences.get('style', 'professional'),
-                'platforms': preferences.get('platforms', ['twitter']),
-                'created_at': datetime.now()
-            }
-            result = self.preferences.insert_one(preference_data)
-            return str(result.inserted_id)
+    Returns:
+        MongoClient that connects lazily
+    """
+    uri = uri or os.getenv('MONGO_URI', 'mongodb://localhost:27017')
+    uri_options = {key.lower() for key in parse_qs(urlsplit(uri).query)}
+    options = {key: value for key, value in _MONGO_CLIENT_OPTIONS.items() if key.lower() not in uri_options}
+    return MongoClient(uri, **options)
+
+def _create_index(collection, keys: List[Tuple[str, int]], **options):
+    """
+    Create one index, logging instead of raising when it cannot be built.
+    
+    Each index is created on its own so that one failure, such as a unique
+    index over existing duplicates, does not prevent the others.
+    
+    Args:
+        collection: Collection to index
+        keys: Index key specification
+        **options: Options passed to create_index
+    """
+    try:
+        collection.create_index(keys, **options)
+    except pymongo.errors.PyMongoError as e:
+        logging.getLogger(__name__).warning(
+            "Failed to create index %s on %s: %s", keys, collection.name, e
+        )
+
+class _TTLCache:
+    """Thread-safe LRU cache whose entries expire after a fixed number of seconds."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return a live entry and mark it as recently used, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: Any):
+        """Store an entry, evicting the least recently used one."""
+        if self.maxsize <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def pop(self, key: str):
+        """Drop an entry so the next read goes to the database."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+def _quantize_embedding(embedding: List[float]) -> Dict[str, Any]:
+    """
+    Scalar-quantize an embedding to an int8 BSON vector.
+    
+    Each vector gets its own scale, which cosine similarity ignores, so the
+    stored vectors can be searched directly by a cosine vector index.
+    
+    Args:
+        embedding (List[float]): Embedding vector
         
-        def store_resource(account_id: str, resource_data: Dict[str, Any]) -> str:
-            resource = {
+    Returns:
+        Dict[str, Any]: 'embedding' as int8 binData, with its 'scale' and 'dim'
+    """
+    vector = np.asarray(embedding, dtype=np.float32)
+    max_abs = float(np.abs(vector).max()) if vector.size else 0.0
+    scale = max_abs / 127 if max_abs else 1.0
+    quantized = np.clip(np.rint(vector / scale), -127, 127).astype(np.int8)
+    return {
+        'embedding': Binary.from_vector(quantized.tolist(), BinaryVectorDtype.INT8),
+        'scale': scale,
+        'dim': int(vector.size)
+    }
+
+class _MongoStore:
+    """Account, preference, resource and post storage backed by MongoDB."""
+
+    def __init__(self, db):
+        self.accounts = db.accounts
+        self.preferences = db.preferences
+        self.resources = db.resources
+        self.posts = db.posts
+        # Unacknowledged handles for bulk inserts of non-critical records
+        self.resources_fast = self.resources.with_options(write_concern=WriteConcern(w=0))
+        self.posts_fast = self.posts.with_options(write_concern=WriteConcern(w=0))
+        # Short-lived read-through caches for lookups
+        self._resource_cache = _TTLCache(10_000, float(os.getenv('RESOURCE_CACHE_TTL', '60')))
+        self._preferences_cache = _TTLCache(5_000, float(os.getenv('PREFERENCES_CACHE_TTL', '30')))
+
+    def ensure_indexes(self):
+        """Create indexes for the lookup and sort paths; existing indexes are left as they are."""
+        # Filter fields first and the sort fields last so one index serves both
+        _create_index(self.preferences, [('account_id', 1), ('created_at', -1), ('_id', -1)])
+        _create_index(self.posts, [('account_id', 1), ('generated_at', -1)])
+        _create_index(self.resources, [('resource_id', 1)], unique=True)
+        # Fails while accounts stored before upserts are duplicated, which is logged
+        _create_index(self.accounts, [('account_id', 1)], unique=True)
+
+    def store_account(self, account_id: str) -> str:
+        # account_id is unique, so repeat requests keep the existing account
+        result = self.accounts.find_one_and_update(
+            {'account_id': account_id},
+            {'$setOnInsert': {'account_id': account_id, 'created_at': datetime.now()}},
+            upsert=True,
+            projection={'_id': 1},
+            return_document=pymongo.ReturnDocument.AFTER
+        )
+        return str(result['_id'])
+
+    def store_preferences(self, account_id: str, preferences: Dict[str, Any]) -> str:
+        preference_data = {
+            'account_id': account_id,
+            'preference_id': f"pref_{uuid.uuid4().hex}",
+            'niche': preferences.get('niche'),
+            'subtopics': preferences.get('subtopics', []),
+            'generated_keywords': preferences.get('keywords', []),
+            'content_style': preferences.get('style', 'professional'),
+            'platforms': preferences.get('platforms', ['twitter']),
+            'created_at': datetime.now()
+        }
+        result = self.preferences.insert_one(preference_data)
+        self._preferences_cache.pop(account_id)
+        return str(result.inserted_id)
+
+    def store_resource(self, account_id: str, resource_data: Dict[str, Any]) -> str:
+        resource = {
+            'account_id': account_id,
+            'resource_id': f"res_{uuid.uuid4().hex}",
+            'content': resource_data.get('content'),
+            'metadata': resource_data.get('metadata', {}),
+            'keywords': resource_data.get('keywords', []),
+            'usage_count': 0,
+            'last_used': None,
+            'created_at': datetime.now()
+        }
+        result = self.resources.insert_one(resource)
+        return str(result.inserted_id)
+
+    def store_resources_bulk(self, account_id: str, resources: List[Dict[str, Any]], fast_insert: bool = True) -> List[str]:
+        now = datetime.now()
+        docs = [
+            {
                 'account_id': account_id,
-                'resource_id': f"res_{datetime.now().timestamp()}",
+                'resource_id': f"res_{uuid.uuid4().hex}",
                 'content': resource_data.get('content'),
                 'metadata': resource_data.get('metadata', {}),
                 'keywords': resource_data.get('keywords', []),
                 'usage_count': 0,
                 'last_used': None,
-                'created_at': datetime.now()
+                'created_at': now
             }
-            result = self.resources.insert_one(resource)
-            return str(result.inserted_id)
-        
-        def store_post(account_id: str, resource_id: str, content: str, platform: str, metadata: Dict[str, Any]) -> str:
-            post_data = {
+            for resource_data in resources
+        ]
+        if not docs:
+            return []
+        # Unacknowledged writes skip the per-batch round-trip wait
+        collection = self.resources_fast if fast_insert else self.resources
+        collection.insert_many(docs, ordered=False)
+        return [str(doc['_id']) for doc in docs]
+
+    def store_post(self, account_id: str, resource_id: str, content: str, platform: str, metadata: Dict[str, Any]) -> str:
+        now = datetime.now()
+        post_data = {
+            'account_id': account_id,
+            'post_id': f"post_{uuid.uuid4().hex}",
+            'resource_id': resource_id,
+            'content': content,
+            'platform': platform,
+            'generated_at': now,
+            'performance_metrics': {
+                'views': 0,
+                'likes': 0,
+                'shares': 0,
+                'comments': 0
+            },
+            'platform_specific_metadata': metadata.get('platform_specific', {}),
+            'created_at': now
+        }
+        result = self.posts.insert_one(post_data)
+        return str(result.inserted_id)
+
+    def store_posts_bulk(self, account_id: str, posts: List[Dict[str, Any]], fast_insert: bool = True) -> List[str]:
+        now = datetime.now()
+        docs = [
+            {
                 'account_id': account_id,
-                'post_id': f"post_{datetime.now().timestamp()}",
-                'resource_id': resource_id,
-                'content': content,
-                'platform': platform,
-                'generated_at': datetime.now(),
+                'post_id': f"post_{uuid.uuid4().hex}",
+                'resource_id': post.get('resource_id'),
+                'content': post.get('content'),
+                'platform': post.get('platform', 'twitter'),
+                'generated_at': now,
                 'performance_metrics': {
                     'views': 0,
                     'likes': 0,
                     'shares': 0,
                     'comments': 0
                 },
-                'platform_specific_metadata': metadata.get('platform_specific', {}),
-                'created_at': datetime.now()
+                'platform_specific_metadata': post.get('metadata', {}).get('platform_specific', {}),
+                'created_at': now
             }
-            result = self.posts.insert_one(post_data)
-            return str(result.inserted_id)
-        
-        def get_account_preferences(account_id: str) -> Dict[str, Any]:
+            for post in posts
+        ]
+        if not docs:
+            return []
+        collection = self.posts_fast if fast_insert else self.posts
+        collection.insert_many(docs, ordered=False)
+        return [str(doc['_id']) for doc in docs]
+
+    def get_account_preferences(self, account_id: str) -> Dict[str, Any]:
+        preferences = self._preferences_cache.get(account_id)
+        if preferences is None:
             preferences = self.preferences.find_one(
                 {'account_id': account_id},
-                sort=[('created_at', -1)]
-            )
-            return preferences if preferences else {}
-        
-        def get_resource(resource_id: str) -> Optional[Dict[str, Any]]:
+                # Preferences stored within the same millisecond are ordered by insertion
+                sort=[('created_at', -1), ('_id', -1)]
+            ) or {}
+            self._preferences_cache.put(account_id, preferences)
+        return preferences
+
+    def get_resource(self, resource_id: str) -> Optional[Dict[str, Any]]:
+        resource = self._resource_cache.get(resource_id)
+        if resource is None:
+            # Misses are not cached, a resource written unacknowledged may land later
             resource = self.resources.find_one({'resource_id': resource_id})
-            return resource if resource else None
-        
-        # Assign methods
-        self.store_account = store_account
-        self.store_preferences = store_preferences
-        self.store_resource = store_resource
-        self.store_post = store_post
-        self.get_account_preferences = get_account_preferences
-        self.get_resource = get_resource
-    
-    def _setup_inmemory_storage(self):
-        """Set up in-memory storage for testing."""
+            if resource:
+                self._resource_cache.put(resource_id, resource)
+        return resource if resource else None
+
+class _InMemoryStore:
+    """Account, preference, resource and post storage in process memory, for testing."""
+
+    def __init__(self):
         self._accounts = {}
         self._preferences = {}
         self._resources = {}
         self._posts = {}
-        
-        def store_account(account_id: str) -> str:
-            data = {
-                'account_id': account_id,
-                'created_at': datetime.now()
-            }
-            self._accounts[account_id] = data
-            return account_id
-        
-        def store_preferences(account_id: str, preferences: Dict[str, Any]) -> str:
-            preference_id = f"pref_{datetime.now().timestamp()}"
-            data = {
-                'account_id': account_id,
-                'preference_id': preference_id,
-                'niche': preferences.get('niche'),
-                'subtopics': preferences.get('subtopics', []),
-                'generated_keywords': preferences.get('keywords', []),
-                'content_style': preferences.get('style', 'professional'),
-                'platforms': preferences.get('platforms', ['twitter']),
-                'created_at': datetime.now()
-            }
-            self._preferences[preference_id] = data
-            return preference_id
-        
-        def store_resource(account_id: str, resource_data: Dict[str, Any]) -> str:
-            resource_id = f"res_{datetime.now().timestamp()}"
-            data = {
+        # Record IDs per account in insertion order, so the last one is the latest
+        self._prefs_by_account: Dict[str, List[str]] = defaultdict(list)
+        self._posts_by_account: Dict[str, List[str]] = defaultdict(list)
+
+    def store_account(self, account_id: str) -> str:
+        data = {
+            'account_id': account_id,
+            'created_at': datetime.now()
+        }
+        self._accounts[account_id] = data
+        return account_id
+
+    def store_preferences(self, account_id: str, preferences: Dict[str, Any]) -> str:
+        preference_id = f"pref_{uuid.uuid4().hex}"
+        data = {
+            'account_id': account_id,
+            'preference_id': preference_id,
+            'niche': preferences.get('niche'),
+            'subtopics': preferences.get('subtopics', []),
+            'generated_keywords': preferences.get('keywords', []),
+            'content_style': preferences.get('style', 'professional'),
+            'platforms': preferences.get('platforms', ['twitter']),
+            'created_at': datetime.now()
+        }
+        self._preferences[preference_id] = data
+        self._prefs_by_account[account_id].append(preference_id)
+        return preference_id
+
+    def store_resource(self, account_id: str, resource_data: Dict[str, Any]) -> str:
+        resource_id = f"res_{uuid.uuid4().hex}"
+        data = {
+            'account_id': account_id,
+            'resource_id': resource_id,
+            'content': resource_data.get('content'),
+            'metadata': resource_data.get('metadata', {}),
+            'keywords': resource_data.get('keywords', []),
+            'usage_count': 0,
+            'last_used': None,
+            'created_at': datetime.now()
+        }
+        self._resources[resource_id] = data
+        return resource_id
+
+    def store_resources_bulk(self, account_id: str, resources: List[Dict[str, Any]], fast_insert: bool = True) -> List[str]:
+        now = datetime.now()
+        resource_ids = []
+        for resource_data in resources:
+            resource_id = f"res_{uuid.uuid4().hex}"
+            self._resources[resource_id] = {
                 'account_id': account_id,
                 'resource_id': resource_id,
                 'content': resource_data.get('content'),
@@ -156,48 +378,250 @@ class RAGService:
                 'keywords': resource_data.get('keywords', []),
                 'usage_count': 0,
                 'last_used': None,
-                'created_at': datetime.now()
+                'created_at': now
             }
-            self._resources[resource_id] = data
-            return resource_id
-        
-        def store_post(account_id: str, resource_id: str, content: str, platform: str, metadata: Dict[str, Any]) -> str:
-            post_id = f"post_{datetime.now().timestamp()}"
-            data = {
+            resource_ids.append(resource_id)
+        return resource_ids
+
+    def store_post(self, account_id: str, resource_id: str, content: str, platform: str, metadata: Dict[str, Any]) -> str:
+        now = datetime.now()
+        post_id = f"post_{uuid.uuid4().hex}"
+        data = {
+            'account_id': account_id,
+            'post_id': post_id,
+            'resource_id': resource_id,
+            'content': content,
+            'platform': platform,
+            'generated_at': now,
+            'performance_metrics': {
+                'views': 0,
+                'likes': 0,
+                'shares': 0,
+                'comments': 0
+            },
+            'platform_specific_metadata': metadata.get('platform_specific', {}),
+            'created_at': now
+        }
+        self._posts[post_id] = data
+        self._posts_by_account[account_id].append(post_id)
+        return post_id
+
+    def store_posts_bulk(self, account_id: str, posts: List[Dict[str, Any]], fast_insert: bool = True) -> List[str]:
+        now = datetime.now()
+        post_ids = []
+        for post in posts:
+            post_id = f"post_{uuid.uuid4().hex}"
+            self._posts[post_id] = {
                 'account_id': account_id,
                 'post_id': post_id,
-                'resource_id': resource_id,
-                'content': content,
-                'platform': platform,
-                'generated_at': datetime.now(),
+                'resource_id': post.get('resource_id'),
+                'content': post.get('content'),
+                'platform': post.get('platform', 'twitter'),
+                'generated_at': now,
                 'performance_metrics': {
                     'views': 0,
                     'likes': 0,
                     'shares': 0,
                     'comments': 0
                 },
-                'platform_specific_metadata': metadata.get('platform_specific', {}),
-                'created_at': datetime.now()
+                'platform_specific_metadata': post.get('metadata', {}).get('platform_specific', {}),
+                'created_at': now
             }
-            self._posts[post_id] = data
-            return post_id
-        
-        def get_account_preferences(account_id: str) -> Dict[str, Any]:
-            for pref in self._preferences.values():
-                if pref['account_id'] == account_id:
-                    return pref
-            return {}
-        
-        def get_resource(resource_id: str) -> Optional[Dict[str, Any]]:
-            return self._resources.get(resource_id)
-        
-        # Assign methods
-        self.store_account = store_account
-        self.store_preferences = store_preferences
-        self.store_resource = store_resource
-        self.store_post = store_post
-        self.get_account_preferences = get_account_preferences
-        self.get_resource = get_resource
+            post_ids.append(post_id)
+        self._posts_by_account[account_id].extend(post_ids)
+        return post_ids
+
+    def get_account_preferences(self, account_id: str) -> Dict[str, Any]:
+        preference_ids = self._prefs_by_account.get(account_id)
+        return self._preferences[preference_ids[-1]] if preference_ids else {}
+
+    def get_resource(self, resource_id: str) -> Optional[Dict[str, Any]]:
+        return self._resources.get(resource_id)
+
+class RAGService:
+    def __init__(self, mongo_client: Optional[MongoClient] = None, session: Optional[requests.Session] = None):
+        self.logger = logging.getLogger(__name__)
+        self.session = session or self._create_session()
+        # LRU cache of embeddings keyed by a hash of model and text
+        self._embedding_cache: OrderedDict = OrderedDict()
+        self._embedding_cache_size = int(os.getenv('EMBEDDING_CACHE_SIZE', '4096'))
+        self._embedding_cache_lock = threading.Lock()
+        
+        # Ollama configuration
+        self.ollama_host = os.getenv('OLLAMA_HOST', 'http://localhost:11434')
+        self.model_name = os.getenv('MODEL_NAME', 'gemma:7b')
+        # Chat request fields shared by every non-streaming call
+        self._chat_body = {"model": self.model_name, "stream": False}
+        
+        # Account, preference, resource and post storage, chosen on first use
+        self._store = None
+        self._started = False
+        self._start_lock = threading.Lock()
+        try:
+            # Initialize MongoDB client, reusing the caller's client when given; it connects lazily
+            self.mongo_client = mongo_client or create_mongo_client()
+            self.db = self.mongo_client[os.getenv('DB_NAME', 'llm_papers')]
+            
+            # Collections for documents and their embeddings
+            self.embeddings_collection = self.db.embeddings
+            self.metadata_collection = self.db.metadata
+        except Exception as e:
+            self.logger.warning("MongoDB client creation failed, using in-memory storage: %s", e)
+            self._store = _InMemoryStore()
+            self._started = True
+    
+    def _ensure_started(self):
+        """
+        Connect to MongoDB and index it on first use.
+        
+        Construction stays cheap; the ping and index creation run once, and an
+        unreachable server falls back to in-memory storage.
+        
+        Returns:
+            The account, preference, resource and post storage
+        """
+        if not self._started:
+            with self._start_lock:
+                if not self._started:
+                    try:
+                        self.mongo_client.admin.command('ping')
+                        self._store = _MongoStore(self.db)
+                        # Index the lookup paths before serving requests
+                        self._ensure_indexes()
+                    except Exception as e:
+                        self.logger.warning("MongoDB connection failed, using in-memory storage: %s", e)
+                        self._store = _InMemoryStore()
+                    self._started = True
+        return self._store
+    
+    @staticmethod
+    def _create_session() -> requests.Session:
+        """Create a keep-alive session with a connection pool for Ollama calls."""
+        session = requests.Session()
+        retry = Retry(total=2, backoff_factor=0.2, allowed_methods=["GET", "POST"])
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=50, max_retries=retry)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers['Connection'] = 'keep-alive'
+        return session
+
+    def _ensure_indexes(self):
+        """Create indexes for the lookup and sort paths; existing indexes are left as they are."""
+        self._store.ensure_indexes()
+        _create_index(self.metadata_collection, [('embedding_id', 1)])
+        # Documents stored before hashing have no content_hash and are left out
+        _create_index(
+            self.metadata_collection,
+            [('content_hash', 1)],
+            unique=True,
+            partialFilterExpression={'content_hash': {'$exists': True}}
+        )
+
+    def store_account(self, account_id: str) -> str:
+        """
+        Store an account, keeping the existing one for a known account_id.
+        
+        Args:
+            account_id (str): Account identifier
+            
+        Returns:
+            str: Stored account ID
+        """
+        return self._ensure_started().store_account(account_id)
+
+    def store_preferences(self, account_id: str, preferences: Dict[str, Any]) -> str:
+        """
+        Store content preferences for an account.
+        
+        Args:
+            account_id (str): Account identifier
+            preferences (Dict[str, Any]): Niche, subtopics, keywords, style and platforms
+            
+        Returns:
+            str: Stored preferences ID
+        """
+        return self._ensure_started().store_preferences(account_id, preferences)
+
+    def store_resource(self, account_id: str, resource_data: Dict[str, Any]) -> str:
+        """
+        Store a collected resource for an account.
+        
+        Args:
+            account_id (str): Account identifier
+            resource_data (Dict[str, Any]): Resource content, metadata and keywords
+            
+        Returns:
+            str: Stored resource ID
+        """
+        return self._ensure_started().store_resource(account_id, resource_data)
+
+    def store_resources_bulk(self, account_id: str, resources: List[Dict[str, Any]], fast_insert: bool = True) -> List[str]:
+        """
+        Store several resources for an account in one write.
+        
+        Args:
+            account_id (str): Account identifier
+            resources (List[Dict[str, Any]]): Resources' content, metadata and keywords
+            fast_insert (bool): Write without waiting for acknowledgement
+            
+        Returns:
+            List[str]: Stored resource IDs, in input order
+        """
+        return self._ensure_started().store_resources_bulk(account_id, resources, fast_insert)
+
+    def store_post(self, account_id: str, resource_id: str, content: str, platform: str, metadata: Dict[str, Any]) -> str:
+        """
+        Store a generated post for an account.
+        
+        Args:
+            account_id (str): Account identifier
+            resource_id (str): Resource the post was generated from
+            content (str): Post content
+            platform (str): Target platform
+            metadata (Dict[str, Any]): Post metadata
+            
+        Returns:
+            str: Stored post ID
+        """
+        return self._ensure_started().store_post(account_id, resource_id, content, platform, metadata)
+
+    def store_posts_bulk(self, account_id: str, posts: List[Dict[str, Any]], fast_insert: bool = True) -> List[str]:
+        """
+        Store several generated posts for an account in one write.
+        
+        Args:
+            account_id (str): Account identifier
+            posts (List[Dict[str, Any]]): Posts' resource_id, content, platform and metadata
+            fast_insert (bool): Write without waiting for acknowledgement
+            
+        Returns:
+            List[str]: Stored post IDs, in input order
+        """
+        return self._ensure_started().store_posts_bulk(account_id, posts, fast_insert)
+
+    def get_account_preferences(self, account_id: str) -> Dict[str, Any]:
+        """
+        Get an account's most recently stored preferences.
+        
+        Args:
+            account_id (str): Account identifier
+            
+        Returns:
+            Dict[str, Any]: Preferences, empty when none are stored
+        """
+        return self._ensure_started().get_account_preferences(account_id)
+
+    def get_resource(self, resource_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a stored resource.
+        
+        Args:
+            resource_id (str): Resource identifier
+            
+        Returns:
+            Optional[Dict[str, Any]]: Resource, or None when it does not exist
+        """
+        return self._ensure_started().get_resource(resource_id)
 
     def embed_text(self, text: str) -> List[float]:
         """
@@ -207,21 +631,97 @@ class RAGService:
             text (str): Text to embed
             
         Returns:
-            List[float]: Embedding vector
+            List[float]: Embedding vector, served from the cache for repeated text
         """
+        key = self._embedding_key(text)
+        cached = self._embedding_cache_get(key)
+        if cached is not None:
+            return cached
         try:
-            response = requests.post(
+            response = self.session.post(
                 f"{self.ollama_host}/api/embeddings",
-                json={
+                data=orjson.dumps({
                     "model": self.model_name,
                     "prompt": text
-                }
+                }),
+                headers=_JSON_HEADERS,
+                timeout=_OLLAMA_TIMEOUT
             )
             response.raise_for_status()
-            return response.json()['embedding']
-        except Exception as e:
-            print(f"Error generating embeddings: {e}")
+            embedding = orjson.loads(response.content)['embedding']
+        except Exception:
+            self.logger.exception("Error generating embeddings")
             return []
+        self._embedding_cache_put(key, embedding)
+        return embedding
+
+    @staticmethod
+    def _content_hash(content: str, doc_type: str) -> str:
+        """Identify a document by its type and content, for skipping re-ingested duplicates."""
+        return hashlib.blake2b(f"{doc_type}\0{content}".encode(), digest_size=16).hexdigest()
+
+    def _embedding_key(self, text: str) -> bytes:
+        """Build a bounded-size embedding cache key from the model name and text."""
+        return hashlib.blake2b(f"{self.model_name}\0{text}".encode(), digest_size=16).digest()
+
+    def _embedding_cache_get(self, key: bytes) -> Optional[List[float]]:
+        """Return a cached embedding and mark it as recently used."""
+        with self._embedding_cache_lock:
+            if key in self._embedding_cache:
+                self._embedding_cache.move_to_end(key)
+                return self._embedding_cache[key]
+        return None
+
+    def _embedding_cache_put(self, key: bytes, embedding: List[float]):
+        """Store an embedding, evicting the least recently used one."""
+        if self._embedding_cache_size <= 0 or not embedding:
+            return
+        with self._embedding_cache_lock:
+            self._embedding_cache[key] = embedding
+            if len(self._embedding_cache) > self._embedding_cache_size:
+                self._embedding_cache.popitem(last=False)
+
+    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """
+        Generate embeddings for several texts, with one Ollama call for the uncached ones.
+        
+        Uses Ollama's batch /api/embed endpoint and falls back to concurrent
+        single-text requests on servers without it.
+        
+        Args:
+            texts (List[str]): Texts to embed
+            
+        Returns:
+            List[List[float]]: One embedding per text, empty for texts that failed
+        """
+        keys = [self._embedding_key(text) for text in texts]
+        embeddings = [self._embedding_cache_get(key) for key in keys]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if not missing:
+            return embeddings
+        try:
+            response = self.session.post(
+                f"{self.ollama_host}/api/embed",
+                data=orjson.dumps({
+                    "model": self.model_name,
+                    "input": [texts[i] for i in missing]
+                }),
+                headers=_JSON_HEADERS,
+                timeout=_OLLAMA_TIMEOUT
+            )
+            response.raise_for_status()
+            batch = orjson.loads(response.content)['embeddings']
+            if len(batch) != len(missing):
+                raise ValueError("Ollama returned a different number of embeddings")
+            for i, embedding in zip(missing, batch):
+                embeddings[i] = embedding
+                self._embedding_cache_put(keys[i], embedding)
+        except Exception as e:
+            self.logger.warning("Batch embedding failed, embedding texts one by one: %s", e)
+            with ThreadPoolExecutor(max_workers=min(8, len(missing))) as executor:
+                for i, embedding in zip(missing, executor.map(self.embed_text, [texts[i] for i in missing])):
+                    embeddings[i] = embedding
+        return embeddings
 
     def store_document(self, 
                       content: str, 
@@ -236,34 +736,119 @@ class RAGService:
             doc_type (str): Type of document (e.g., 'paper', 'repo', 'user')
             
         Returns:
-            str: Document ID
+            str: Document ID, the existing one when identical content was already stored
+            
+        Raises:
+            ValueError: If the content could not be embedded
         """
+        self._ensure_started()
+        content_hash = self._content_hash(content, doc_type)
+        existing = self.metadata_collection.find_one({'content_hash': content_hash}, projection={'_id': 1})
+        if existing:
+            return str(existing['_id'])
+        
+        now = datetime.now()
+        # Generate embeddings
+        embedding = self.embed_text(content)
+        if not embedding:
+            # Storing the hash without a vector would block every later attempt
+            raise ValueError("Failed to generate embedding for document")
+        
+        # Store embeddings
+        embedding_doc = {
+            **_quantize_embedding(embedding),
+            'doc_type': doc_type,
+            'content_hash': content_hash,
+            'created_at': now
+        }
+        embedding_id = self.embeddings_collection.insert_one(embedding_doc).inserted_id
+        
+        # Store metadata
+        metadata_doc = {
+            'embedding_id': embedding_id,
+            'content': content,
+            'metadata': metadata,
+            'doc_type': doc_type,
+            'content_hash': content_hash,
+            'created_at': now
+        }
         try:
-            # Generate embeddings
-            embedding = self.embed_text(content)
-            
-            # Store embeddings
-            embedding_doc = {
-                'embedding': embedding,
-                'doc_type': doc_type,
-                'created_at': datetime.now()
-            }
-            embedding_id = self.embeddings_collection.insert_one(embedding_doc).inserted_id
-            
-            # Store metadata
-            metadata_doc = {
-                'embedding_id': embedding_id,
-                'content': content,
-                'metadata': metadata,
-                'doc_type': doc_type,
-                'created_at': datetime.now()
-            }
             metadata_id = self.metadata_collection.insert_one(metadata_doc).inserted_id
+        except pymongo.errors.DuplicateKeyError:
+            # A concurrent writer stored the same document first
+            self.embeddings_collection.delete_one({'_id': embedding_id})
+            existing = self.metadata_collection.find_one({'content_hash': content_hash}, projection={'_id': 1})
+            return str(existing['_id'])
+        
+        return str(metadata_id)
+
+    def store_documents_bulk(self, documents: List[Dict[str, Any]]) -> List[Optional[str]]:
+        """
+        Store several documents, embedding them in one batch and writing them with bulk inserts.
+        
+        Args:
+            documents (List[Dict[str, Any]]): Documents with 'content', 'metadata' and 'doc_type'
             
-            return str(metadata_id)
-        except Exception as e:
-            print(f"Error storing document: {e}")
-            return ""
+        Returns:
+            List[Optional[str]]: Document IDs in input order, existing ones for content already
+            stored and None for documents that could not be embedded
+        """
+        if not documents:
+            return []
+        self._ensure_started()
+        hashes = [self._content_hash(document['content'], document['doc_type']) for document in documents]
+        ids_by_hash = {
+            metadata['content_hash']: str(metadata['_id'])
+            for metadata in self.metadata_collection.find(
+                {'content_hash': {'$in': hashes}},
+                projection={'content_hash': 1}
+            )
+        }
+        # First occurrence of each document not stored yet
+        new_documents = {}
+        for document, content_hash in zip(documents, hashes):
+            if content_hash not in ids_by_hash:
+                new_documents.setdefault(content_hash, document)
+        
+        if new_documents:
+            now = datetime.now()
+            embeddings = self.embed_texts([document['content'] for document in new_documents.values()])
+            # Documents that failed to embed are skipped, so a later call can store them
+            embedded = [
+                (content_hash, document, embedding)
+                for (content_hash, document), embedding in zip(new_documents.items(), embeddings)
+                if embedding
+            ]
+            if len(embedded) < len(new_documents):
+                self.logger.warning("Skipping %d documents that failed to embed", len(new_documents) - len(embedded))
+            
+            if embedded:
+                embedding_docs = [
+                    {
+                        **_quantize_embedding(embedding),
+                        'doc_type': document['doc_type'],
+                        'content_hash': content_hash,
+                        'created_at': now
+                    }
+                    for content_hash, document, embedding in embedded
+                ]
+                embedding_ids = self.embeddings_collection.insert_many(embedding_docs).inserted_ids
+                
+                metadata_docs = [
+                    {
+                        'embedding_id': embedding_id,
+                        'content': document['content'],
+                        'metadata': document.get('metadata', {}),
+                        'doc_type': document['doc_type'],
+                        'content_hash': content_hash,
+                        'created_at': now
+                    }
+                    for (content_hash, document, _), embedding_id in zip(embedded, embedding_ids)
+                ]
+                metadata_ids = self.metadata_collection.insert_many(metadata_docs).inserted_ids
+                ids_by_hash.update(zip((content_hash for content_hash, _, _ in embedded), map(str, metadata_ids)))
+        
+        return [ids_by_hash.get(content_hash) for content_hash in hashes]
 
     def retrieve_similar_documents(self, 
                                  query: str, 
@@ -280,39 +865,47 @@ class RAGService:
         Returns:
             List[Dict[str, Any]]: List of similar documents with metadata
         """
+        self._ensure_started()
         try:
             # Generate query embedding
             query_embedding = self.embed_text(query)
             
+            # Filter by type inside the search, so it returns up to limit matching documents
+            vector_search = {
+                "queryVector": _quantize_embedding(query_embedding)['embedding'],
+                "path": "embedding",
+                "numCandidates": max(100, 10 * limit),
+                "limit": limit,
+                "index": "vector_index"
+            }
+            if doc_type:
+                vector_search["filter"] = {"doc_type": {"$eq": doc_type}}
+            
             # Build aggregation pipeline
-            pipeline = [
-                {
-                    "$vectorSearch": {
-                        "queryVector": query_embedding,
-                        "path": "embedding",
-                        "numCandidates": 100,
-                        "limit": limit,
-                        "index": "vector_index"
-                    }
-                }
-            ]
+            pipeline = [{"$vectorSearch": vector_search}]
             
-            if doc_type:
-                pipeline.append({
-                    "$match": {
-                        "doc_type": doc_type
-                    }
-                })
+            # Return only IDs and scores, not the embedding vectors
+            pipeline.append({
+                "$project": {
+                    "_id": 1,
+                    "score": {"$meta": "vectorSearchScore"}
+                }
+            })
             
             # Execute search
             results = list(self.embeddings_collection.aggregate(pipeline))
             
-            # Get metadata for results
+            # Get metadata for all results in one query, keeping the search order
+            metadata_by_id = {
+                metadata['embedding_id']: metadata
+                for metadata in self.metadata_collection.find(
+                    {'embedding_id': {'$in': [result['_id'] for result in results]}},
+                    projection={'embedding_id': 1, 'content': 1, 'metadata': 1, '_id': 0}
+                )
+            }
             similar_docs = []
             for result in results:
-                metadata = self.metadata_collection.find_one({
-                    'embedding_id': result['_id']
-                })
+                metadata = metadata_by_id.get(result['_id'])
                 if metadata:
                     similar_docs.append({
                         'content': metadata['content'],
@@ -321,8 +914,8 @@ class RAGService:
                     })
             
             return similar_docs
-        except Exception as e:
-            print(f"Error retrieving similar documents: {e}")
+        except Exception:
+            self.logger.exception("Error retrieving similar documents")
             return []
 
     def generate_with_context(self, context: str, query: str) -> str:
@@ -336,27 +929,53 @@ class RAGService:
         Returns:
             str: Generated text
         """
-        # Create system message with context
-        system_message = f"""You are a helpful assistant. Use the following context to answer the user's question:
-
-{context}
-
-Please provide a detailed and accurate response based on the context above."""
-
         # Generate response
-        response = requests.post(
+        response = self.session.post(
             f"{self.ollama_host}/api/chat",
-            json={
-                "model": self.model_name,
-                "messages": [
-                    {"role": "system", "content": system_message},
-                    {"role": "user", "content": query}
-                ],
-                "stream": False
-            }
+            data=orjson.dumps({**self._chat_body, "messages": self._context_messages(context, query)}),
+            headers=_JSON_HEADERS,
+            timeout=_OLLAMA_TIMEOUT
         )
         response.raise_for_status()
-        return response.json()['message']['content']
+        return orjson.loads(response.content)['message']['content']
+
+    def generate_with_context_stream(self, context: str, query: str) -> Iterator[str]:
+        """
+        Generate text using Ollama with context, yielding chunks as they are produced.
+        
+        Args:
+            context (str): The context to use for generation
+            query (str): The query to answer
+            
+        Yields:
+            str: Generated text chunks
+        """
+        response = self.session.post(
+            f"{self.ollama_host}/api/chat",
+            data=orjson.dumps({**self._chat_body, "stream": True, "messages": self._context_messages(context, query)}),
+            headers=_JSON_HEADERS,
+            stream=True,
+            timeout=_OLLAMA_TIMEOUT
+        )
+        with response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = orjson.loads(line)
+                content = chunk.get('message', {}).get('content')
+                if content:
+                    yield content
+                if chunk.get('done'):
+                    break
+
+    @staticmethod
+    def _context_messages(context: str, query: str) -> List[Dict[str, str]]:
+        """Build the chat messages answering a query from the given context."""
+        return [
+            {"role": "system", "content": _CONTEXT_SYSTEM_PROMPT.format_map({'context': context})},
+            {"role": "user", "content": query}
+        ]
 
     def create_twitter_post(self, content: str, style: str = "professional") -> Dict[str, Any]:
         """
@@ -370,33 +989,23 @@ Please provide a detailed and accurate response based on the context above."""
             Dict[str, Any]: Generated Twitter post with metadata
         """
         # Create prompt for generating tweet
-        prompt = f"""Generate a {style} tweet about this content:
-        
-        {content}
-        
-        IMPORTANT FORMATTING RULES:
-        1. ABSOLUTELY NO EMOJIS OR SPECIAL CHARACTERS
-        2. Use plain text only
-        3. Maximum 230 characters
-        4. Must be informative and technical but accessible
-        5. Include key points
-        6. Use hashtags sparingly (max 2-3)
-        7. DO NOT include any URLs in the generated text"""
+        prompt = _TWEET_PROMPT.format_map({'style': style, 'content': content})
         
         # Generate tweet
-        response = requests.post(
+        response = self.session.post(
             f"{self.ollama_host}/api/chat",
-            json={
-                "model": self.model_name,
+            data=orjson.dumps({
+                **self._chat_body,
                 "messages": [
-                    {"role": "system", "content": "You are a professional content creator."},
+                    {"role": "system", "content": _TWEET_SYSTEM_PROMPT},
                     {"role": "user", "content": prompt}
-                ],
-                "stream": False
-            }
+                ]
+            }),
+            headers=_JSON_HEADERS,
+            timeout=_OLLAMA_TIMEOUT
         )
         response.raise_for_status()
-        tweet = response.json()['message']['content']
+        tweet = orjson.loads(response.content)['message']['content']
         
         # Format response
         return {
@@ -405,4 +1014,22 @@ Please provide a detailed and accurate response based on the context above."""
             "mentions": [],
             "style": style,
             "character_count": len(tweet.strip())
-        } 
\ No newline at end of file
+        }
+
+def get_rag_service(mongo_client: Optional[MongoClient] = None, session: Optional[requests.Session] = None) -> RAGService:
+    """
+    Return the process-wide RAGService, creating it on first use.
+    
+    Args:
+        mongo_client: MongoDB client for the service, only used when it is created
+        session: HTTP session for the service, only used when it is created
+        
+    Returns:
+        The shared RAGService
+    """
+    global _rag_service
+    if _rag_service is None:
+        with _rag_lock:
+            if _rag_service is None:
+                _rag_service = RAGService(mongo_client=mongo_client, session=session)
+    return _rag_service
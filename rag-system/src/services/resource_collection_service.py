@@ -13,9 +13,9 @@ load_dotenv()
 
 logger = logging.getLogger(__name__)
 
-@dataclass
+@dataclass(slots=True)
 class Resource:
-    """Class representing a collected resource."""
+    """Class representing a collected resource, without a per-instance __dict__."""
     resource_id: str
     content: str
     metadata: Dict[str, Any]
@@ -89,21 +89,26 @@ class ResourceCollectionService:
     def _mock_papers(self, analysis: NicheAnalysis, limit: int) -> List[Resource]:
         """Generate mock academic papers."""
         papers = []
+        keywords = analysis.keywords
+        now = datetime.now()
+        now_iso = now.isoformat()
+        content = f"Research paper about {analysis.main_topic} focusing on {', '.join(keywords[:2])}. This paper discusses important aspects of the field."
+        title = f"Research on {analysis.main_topic}"
         for i in range(min(limit, 3)):
             paper = Resource(
                 resource_id=f"paper_{i}",
-                content=f"Research paper about {analysis.main_topic} focusing on {', '.join(analysis.keywords[:2])}. This paper discusses important aspects of the field.",
+                content=content,
                 metadata={
-                    "title": f"Research on {analysis.main_topic}",
+                    "title": title,
                     "authors": ["Author 1", "Author 2"],
-                    "published": datetime.now().isoformat(),
+                    "published": now_iso,
                     "url": "https://arxiv.org/abs/mock",
                     "arxiv_id": f"mock_{i}",
-                    "published_date": datetime.now().isoformat()
+                    "published_date": now_iso
                 },
                 resource_type="paper",
-                keywords=analysis.keywords,
-                collected_at=datetime.now()
+                keywords=keywords,
+                collected_at=now
             )
             papers.append(paper)
         return papers
@@ -111,20 +116,24 @@ class ResourceCollectionService:
     def _mock_repositories(self, analysis: NicheAnalysis, limit: int) -> List[Resource]:
         """Generate mock GitHub repositories."""
         repos = []
+        keywords = analysis.keywords
+        now = datetime.now()
+        content = f"Repository implementing {analysis.main_topic} with focus on {', '.join(keywords[:2])}. Includes examples and documentation."
+        repo_name = f"{analysis.main_topic}-implementation"
         for i in range(min(limit, 3)):
             repo = Resource(
                 resource_id=f"repo_{i}",
-                content=f"Repository implementing {analysis.main_topic} with focus on {', '.join(analysis.keywords[:2])}. Includes examples and documentation.",
+                content=content,
                 metadata={
-                    "repo_name": f"{analysis.main_topic}-implementation",
+                    "repo_name": repo_name,
                     "owner": "mock-owner",
                     "url": "https://github.com/mock/repo",
                     "stars": 100,
                     "language": "Python"
                 },
                 resource_type="repository",
-                keywords=analysis.keywords,
-                collected_at=datetime.now()
+                keywords=keywords,
+                collected_at=now
             )
             repos.append(repo)
         return repos
@@ -1,30 +1,88 @@
 import pytest
-import sys
 import os
+import requests
 from dotenv import load_dotenv
 from datetime import datetime
+from collections import OrderedDict
+from unittest import mock
+from freezegun import freeze_time
 from src.services.niche_analysis_service import NicheAnalysisService
 from src.services.niche_analysis_service import NicheAnalysis
-
-# Add src directory to Python path
-sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from src.services.pipeline_service import PipelineService
+from src.services.rag_service import RAGService
 
 # Load test environment variables
 load_dotenv(os.path.join(os.path.dirname(__file__), '.env.test'))
 
+# The session clock is frozen here, and fixtures use it as their timestamp
+GENERATED_AT = datetime(2024, 1, 1)
+
+@pytest.fixture(scope='session', autouse=True)
+def _frozen_time():
+    """Freeze the clock for the session so generated timestamps are identical across runs."""
+    # Event loops and network clients keep the real clock, their timeouts never expire otherwise
+    with freeze_time(GENERATED_AT, ignore=["asyncio", "pymongo", "urllib3", "requests"]) as frozen:
+        yield frozen
+
 @pytest.fixture
-def client():
-    from api import app
+def frozen_clock(_frozen_time):
+    """Session clock for tests that step time forward, moved back to GENERATED_AT afterwards."""
+    yield _frozen_time
+    _frozen_time.move_to(GENERATED_AT)
+
+@pytest.fixture(scope='session')
+def generated_at():
+    """Time of the frozen session clock, for fixture records that carry a timestamp."""
+    return GENERATED_AT
+
+@pytest.fixture(scope='session')
+def ollama_available():
+    """Skip tests that need a live Ollama server, pinging it once per session."""
+    try:
+        requests.get(f"{os.getenv('OLLAMA_HOST', 'http://localhost:11434')}/api/tags", timeout=0.5)
+    except requests.RequestException:
+        pytest.skip("Ollama service not available")
+
+@pytest.fixture(scope='session')
+def _app():
+    """Flask app, imported and configured once per test session."""
+    from src.api import app
     app.config['TESTING'] = True
-    with app.test_client() as client:
-        yield client
+    return app
+
+@pytest.fixture(scope='session')
+def client(_app):
+    return _app.test_client()
 
 @pytest.fixture
-def runner():
-    from api import app
-    return app.test_cli_runner()
+def runner(_app):
+    return _app.test_cli_runner()
+
+@pytest.fixture(scope='session')
+def _autospecs():
+    """Return spec'd service mocks, introspecting each class once per test session."""
+    specs = {}
+    def get(cls):
+        if cls not in specs:
+            specs[cls] = mock.create_autospec(cls, instance=True)
+        # Reset in place, a copy of the mock would share its child mocks
+        specs[cls].reset_mock(return_value=True, side_effect=True)
+        return specs[cls]
+    return get
 
 @pytest.fixture
+def pipeline_mock(_autospecs):
+    return _autospecs(PipelineService)
+
+@pytest.fixture
+def niche_mock(_autospecs):
+    return _autospecs(NicheAnalysisService)
+
+@pytest.fixture
+def rag_mock(_autospecs):
+    return _autospecs(RAGService)
+
+@pytest.fixture(scope='session')
 def valid_user_input():
     return {
         'topic': 'AI in Medical Diagnosis',
@@ -35,12 +93,22 @@ def valid_user_input():
         }
     }
 
-@pytest.fixture
-def niche_service():
+@pytest.fixture(scope='session')
+def _niche_service():
+    """NicheAnalysisService created once per test session."""
     return NicheAnalysisService()
 
 @pytest.fixture
-def sample_niche_analysis():
+def niche_service(_niche_service, monkeypatch):
+    """Shared NicheAnalysisService with empty caches and default settings for each test."""
+    monkeypatch.setattr(_niche_service, 'temperature', 0.2)
+    monkeypatch.setattr(_niche_service, '_response_cache', OrderedDict())
+    monkeypatch.setattr(_niche_service, '_semantic_embeddings', None)
+    monkeypatch.setattr(_niche_service, '_semantic_entries', [])
+    return _niche_service
+
+@pytest.fixture(scope='session')
+def sample_niche_analysis(generated_at):
     return NicheAnalysis(
         main_topic='AI in Medical Diagnosis',
         subtopics=[
@@ -59,5 +127,5 @@ def sample_niche_analysis():
         ],
         content_style='technical',
         target_platforms=['linkedin', 'medium'],
-        generated_at=datetime.now()
+        generated_at=generated_at
     ) 
\ No newline at end of file
@@ -1,65 +1,32 @@
 import pytest
-import sys
-import os
-from dotenv import load_dotenv
-from datetime import datetime
-import json
-from flask import Flask
-from src.api import app
-from src.services.pipeline_service import PipelineService
-from src.services.niche_analysis_service import NicheAnalysisError
-
-# Add the src directory to the Python path
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
-# Load test environment variables
-load_dotenv(os.path.join(os.path.dirname(__file__), '.env.test'))
-
-@pytest.fixture
-def client():
-    app.config['TESTING'] = True
-    with app.test_client() as client:
-        yield client
+from src import api
+from services.niche_analysis_service import NicheAnalysisError
 
 @pytest.fixture
-def error_client():
-    """Test client with error-raising pipeline service"""
-    # Import NicheAnalysisError at the top level
-    from src.services.niche_analysis_service import NicheAnalysisError
+def pipeline_mock(pipeline_mock, monkeypatch):
+    """Spec'd pipeline mock installed in the API for this test only."""
+    monkeypatch.setattr(api, 'pipeline_service', pipeline_mock)
+    return pipeline_mock
 
-    class TestPipelineService:
-        def process_content_request(self, account_id, topic, query, platform):
-            # Raise the error directly
-            raise NicheAnalysisError("Test error")
+class _RaisingPipeline:
+    """Pipeline stand-in whose requests always fail niche analysis."""
 
-    # Replace the pipeline service
-    original_service = app.pipeline_service
-    app.pipeline_service = TestPipelineService()
-    app.config['TESTING'] = True
+    exc = NicheAnalysisError("Test error")
 
-    with app.test_client() as client:
-        yield client
+    def process_content_request(self, **_):
+        raise self.exc
 
-    # Restore the original service
-    app.pipeline_service = original_service
+_RAISER = _RaisingPipeline()
 
 @pytest.fixture
-def mock_pipeline_service(mocker):
-    """Fixture for mocked pipeline service."""
-    mock_pipeline = mocker.Mock()
-    mock_pipeline.process_content_request.side_effect = NicheAnalysisError("Test error")
-    # Replace the pipeline service in the app
-    original_service = app.pipeline_service
-    app.pipeline_service = mock_pipeline
-    yield mock_pipeline
-    # Restore the original service
-    app.pipeline_service = original_service
+def mock_pipeline_service(monkeypatch):
+    """Fixture for error-raising pipeline service."""
+    monkeypatch.setattr(api, 'pipeline_service', _RAISER)
+    return _RAISER
 
-def test_generate_endpoint_success(client, mocker):
+def test_generate_endpoint_success(client, pipeline_mock):
     """Test successful content generation."""
-    # Mock the pipeline service
-    mock_pipeline = mocker.Mock(spec=PipelineService)
-    mock_pipeline.process_content_request.return_value = {
+    pipeline_mock.process_content_request.return_value = {
         'account_id': 'test_account',
         'post_id': 'test_post',
         'resource_id': 'test_resource',
@@ -69,20 +36,16 @@ def test_generate_endpoint_success(client, mocker):
         'performance_metrics': {}
     }
     
-    # Replace the pipeline service in the app
-    app.pipeline_service = mock_pipeline
-    
     response = client.post('/api/v1/generate', 
                          json={
                              'account_id': 'test_account',
                              'topic': 'AI in Healthcare',
                              'query': 'How is AI used in medical diagnosis?',
                              'platform': 'twitter'
-                         },
-                         headers={'Content-Type': 'application/json'})
+                         })
     
     assert response.status_code == 200
-    data = json.loads(response.data)
+    data = response.get_json()
     assert 'success' in data
     assert data['success'] is True
     assert 'data' in data
@@ -92,34 +55,26 @@ def test_generate_endpoint_success(client, mocker):
     assert 'content' in result
     assert result['platform'] == 'twitter'
 
-def test_generate_endpoint_missing_fields(client):
-    """Test handling of missing required fields."""
-    response = client.post('/api/v1/generate', 
-                         json={'topic': 'AI in Healthcare'},
-                         headers={'Content-Type': 'application/json'})
-    
-    assert response.status_code == 400
-    data = json.loads(response.data)
-    assert 'error' in data
-    assert data['error']['code'] == 'VALIDATION_ERROR'
-    assert 'missing_fields' in data['error']['details']
-
-def test_generate_endpoint_invalid_platform(client):
-    """Test handling of invalid platform."""
-    response = client.post('/api/v1/generate', 
-                         json={
-                             'account_id': 'test_account',
-                             'topic': 'AI in Healthcare',
-                             'query': 'How is AI used in medical diagnosis?',
-                             'platform': 'invalid_platform'
-                         },
-                         headers={'Content-Type': 'application/json'})
-    
-    assert response.status_code == 400
-    data = json.loads(response.data)
-    assert 'error' in data
-    assert data['error']['code'] == 'VALIDATION_ERROR'
-    assert 'platform' in data['error']['details']
+@pytest.mark.parametrize('payload, expected_detail_key', [
+    ({'topic': 'AI in Healthcare'}, 'missing_fields'),
+    ({}, 'missing_fields'),
+    ({
+        'account_id': 'test_account',
+        'topic': 'AI in Healthcare',
+        'query': 'How is AI used in medical diagnosis?',
+        'platform': 'invalid_platform'
+    }, 'platform'),
+], ids=['partial_fields', 'empty_body', 'invalid_platform'])
+def test_generate_validation_errors(_app, payload, expected_detail_key):
+    """Test validation of generate request payloads."""
+    # Validation fails before the pipeline runs, so call the view without WSGI dispatch
+    with _app.test_request_context('/api/v1/generate', method='POST', json=payload):
+        with pytest.raises(api.ValidationError) as exc_info:
+            api.generate_content()
+
+    assert exc_info.value.status_code == 400
+    assert exc_info.value.error_code == 'VALIDATION_ERROR'
+    assert expected_detail_key in exc_info.value.details
 
 def test_generate_endpoint_error_handling(client, mock_pipeline_service):
     """Test error handling in the pipeline."""
@@ -129,48 +84,46 @@ def test_generate_endpoint_error_handling(client, mock_pipeline_service):
                              'topic': 'AI in Healthcare',
                              'query': 'How is AI used in medical diagnosis?',
                              'platform': 'twitter'
-                         },
-                         headers={'Content-Type': 'application/json'})
+                         })
     
     assert response.status_code == 400
-    data = json.loads(response.data)
+    data = response.get_json()
     assert 'error' in data
     assert data['error']['code'] == 'NICHE_ANALYSIS_ERROR'
     assert 'Test error' in data['error']['message']
 
-def test_invalid_json(client):
+def test_invalid_json(_app):
     """Test handling of invalid JSON"""
-    response = client.post('/api/v1/generate', 
-                         data='invalid json',
-                         headers={'Content-Type': 'application/json'})
-    
-    assert response.status_code == 400
-    data = json.loads(response.data)
-    assert 'error' in data
-    assert data['error']['code'] == 'VALIDATION_ERROR'
-
-def test_missing_fields(client):
-    """Test handling of missing required fields."""
-    response = client.post('/api/v1/generate', json={})
-    assert response.status_code == 400
-    data = json.loads(response.data)
-    assert 'error' in data
-    assert data['error']['code'] == 'VALIDATION_ERROR'
-    assert 'missing_fields' in data['error']['details']
+    with _app.test_request_context('/api/v1/generate', method='POST',
+                                   data='invalid json',
+                                   headers={'Content-Type': 'application/json'}):
+        with pytest.raises(api.ValidationError) as exc_info:
+            api.generate_content()
+
+    assert exc_info.value.status_code == 400
+    assert exc_info.value.error_code == 'VALIDATION_ERROR'
+    assert exc_info.value.details is None
+
+def test_generate_endpoint_unexpected_error(client, monkeypatch):
+    """Test pipeline failures keep the endpoint's internal error payload"""
+    class FailingPipeline:
+        def process_content_request(self, **_):
+            raise RuntimeError("database down")
+    monkeypatch.setattr(api, 'pipeline_service', FailingPipeline())
+    response = client.post('/api/v1/generate',
+                         json={
+                             'account_id': 'test_account',
+                             'topic': 'AI in Healthcare',
+                             'query': 'How is AI used in medical diagnosis?',
+                             'platform': 'twitter'
+                         })
 
-def test_invalid_platform(client):
-    """Test handling of invalid platform."""
-    response = client.post('/api/v1/generate', json={
-        'account_id': 'test_account',
-        'topic': 'AI in Healthcare',
-        'query': 'How is AI used in medical diagnosis?',
-        'platform': 'invalid_platform'
-    })
-    assert response.status_code == 400
-    data = json.loads(response.data)
-    assert 'error' in data
-    assert data['error']['code'] == 'VALIDATION_ERROR'
-    assert 'platform' in data['error']['details']
+    assert response.status_code == 500
+    assert response.get_json()['error'] == {
+        'code': 'INTERNAL_ERROR',
+        'message': 'Internal server error',
+        'details': 'database down'
+    }
 
 if __name__ == '__main__':
     pytest.main() 
\ No newline at end of file
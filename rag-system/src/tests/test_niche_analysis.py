@@ -1,12 +1,10 @@
 import pytest
-from datetime import datetime
-from src.services.niche_analysis_service import NicheAnalysisService, NicheAnalysis, ValidationError, NicheAnalysisError
+import json
+import copy
+from src.services.niche_analysis_service import NicheAnalysis, ValidationError, NicheAnalysisError
 
-@pytest.fixture
-def niche_service():
-    return NicheAnalysisService()
 
-@pytest.fixture
+@pytest.fixture(scope='session')
 def valid_user_input():
     return {
         'topic': 'AI in Healthcare',
@@ -17,17 +15,19 @@ def valid_user_input():
         }
     }
 
-@pytest.fixture
-def sample_niche_analysis():
+
+@pytest.fixture(scope='session')
+def sample_niche_analysis(generated_at):
     return NicheAnalysis(
         main_topic='AI in Healthcare',
         subtopics=['Medical Diagnosis', 'Patient Care', 'Drug Discovery'],
         keywords=['artificial intelligence', 'healthcare', 'medical diagnosis', 'machine learning', 'patient care'],
         content_style='professional',
         target_platforms=['twitter'],
-        generated_at=datetime.now()
+        generated_at=generated_at
     )
 
+
 def test_validate_user_input(niche_service, valid_user_input):
     """Test input validation with valid input"""
     validated_input = niche_service._validate_user_input(valid_user_input)
@@ -36,6 +36,7 @@ def test_validate_user_input(niche_service, valid_user_input):
     assert validated_input['preferences']['style'] == 'professional'
     assert validated_input['preferences']['query_context'] == 'How is AI used in medical diagnosis?'
 
+
 def test_validate_user_input_missing_topic(niche_service):
     """Test input validation with missing topic"""
     invalid_input = {
@@ -47,6 +48,7 @@ def test_validate_user_input_missing_topic(niche_service):
     with pytest.raises(ValidationError):
         niche_service._validate_user_input(invalid_input)
 
+
 def test_validate_user_input_invalid_preferences(niche_service):
     """Test input validation with invalid preferences"""
     invalid_input = {
@@ -56,6 +58,7 @@ def test_validate_user_input_invalid_preferences(niche_service):
     with pytest.raises(ValidationError):
         niche_service._validate_user_input(invalid_input)
 
+
 def test_validate_user_input_default_values(niche_service):
     """Test input validation with missing preferences fields"""
     input_with_missing_fields = {
@@ -66,6 +69,7 @@ def test_validate_user_input_default_values(niche_service):
     assert validated_input['preferences']['style'] == 'professional'
     assert validated_input['preferences']['query_context'] == 'AI in Healthcare'
 
+
 def test_analyze_niche(niche_service, valid_user_input, sample_niche_analysis):
     """Test successful niche analysis"""
     analysis = niche_service.analyze_niche(valid_user_input)
@@ -91,6 +95,7 @@ def test_analyze_niche(niche_service, valid_user_input, sample_niche_analysis):
     # Verify timestamp
     assert analysis.generated_at
 
+
 def test_analyze_niche_invalid_input(niche_service):
     """Test niche analysis with invalid input"""
     invalid_inputs = [
@@ -104,12 +109,16 @@ def test_analyze_niche_invalid_input(niche_service):
         with pytest.raises(NicheAnalysisError):
             niche_service.analyze_niche(invalid_input)
 
-def test_update_analysis(niche_service, valid_user_input, sample_niche_analysis):
+
+def test_update_analysis(niche_service, valid_user_input, sample_niche_analysis, frozen_clock):
     """Test updating existing analysis"""
-    updated_input = valid_user_input.copy()
-    updated_input['preferences']['platform'].append('twitter')
+    # Session fixtures are shared, and update_analysis changes the analysis in place
+    updated_input = copy.deepcopy(valid_user_input)
+    updated_input['preferences']['platform'] = [valid_user_input['preferences']['platform'], 'twitter']
     
-    updated_analysis = niche_service.update_analysis(sample_niche_analysis, updated_input)
+    # Step the frozen clock so the update gets a later timestamp
+    frozen_clock.tick()
+    updated_analysis = niche_service.update_analysis(copy.deepcopy(sample_niche_analysis), updated_input)
     
     # Verify main topic persists
     assert updated_analysis.main_topic == sample_niche_analysis.main_topic
@@ -122,4 +131,154 @@ def test_update_analysis(niche_service, valid_user_input, sample_niche_analysis)
     assert 'twitter' in updated_analysis.target_platforms
     
     # Verify timestamp is updated
-    assert updated_analysis.generated_at > sample_niche_analysis.generated_at 
\ No newline at end of file
+    assert updated_analysis.generated_at > sample_niche_analysis.generated_at 
+
+
+def test_analyze_niche_single_call(niche_service, valid_user_input, monkeypatch):
+    """Test niche analysis from one combined LLM response"""
+    prompts = []
+    def fake_call_ollama(prompt, max_tokens=128, format_schema=None):
+        prompts.append(prompt)
+        # Wrapped in a code fence, as models often do
+        return "```json\n" + json.dumps({
+            'main_topic': 'AI in Healthcare',
+            'subtopics': ['Medical Diagnosis', 'Patient Care', 'Drug Discovery'],
+            'keywords': ['ai', 'healthcare', 'diagnosis', 'machine learning', 'patient care'],
+            'content_style': 'Professional',
+            'target_platforms': ['twitter', 'myspace']
+        }) + "\n```"
+    monkeypatch.setattr(niche_service, '_call_ollama', fake_call_ollama)
+
+    analysis = niche_service.analyze_niche(valid_user_input)
+
+    assert len(prompts) == 1
+    assert analysis.main_topic == 'AI in Healthcare'
+    assert len(analysis.subtopics) == 3
+    assert len(analysis.keywords) == 5
+    assert analysis.content_style == 'professional'
+    assert analysis.target_platforms == ['twitter']
+
+
+def test_call_ollama_cached(niche_service, monkeypatch):
+    """Test repeated prompts are served from the response cache"""
+    calls = []
+    def fake_request_ollama(prompt, max_tokens=128, format_schema=None):
+        calls.append(prompt)
+        return f"response {len(calls)}"
+    monkeypatch.setattr(niche_service, '_request_ollama', fake_request_ollama)
+
+    assert niche_service._call_ollama('prompt') == 'response 1'
+    assert niche_service._call_ollama('prompt') == 'response 1'
+    assert len(calls) == 1
+
+    # Temperatures above the default bypass the cache
+    niche_service.set_temperature(0.7)
+    assert niche_service._call_ollama('prompt') == 'response 2'
+    assert niche_service._call_ollama('prompt') == 'response 3'
+
+
+def test_build_payload_sends_temperature(niche_service):
+    """Test requests carry the sampling temperature used for caching decisions"""
+    assert json.loads(niche_service._build_payload('prompt', 16))['options']['temperature'] == 0.2
+
+    niche_service.set_temperature(None)
+    assert 'temperature' not in json.loads(niche_service._build_payload('prompt', 16))['options']
+    assert niche_service._cache_key('prompt', 16) is None
+
+
+def test_accumulate_streaming_response(niche_service):
+    """Test streamed chunks, including a chunk split across lines, are joined"""
+    class FakeResponse:
+        def iter_lines(self, decode_unicode=False):
+            yield '{"message": {"content": "AI in "}, "done": false}'
+            yield ''
+            yield '{"message": {"content": '
+            yield '"Healthcare"}, "done": false}'
+            yield '{"message": {"content": ""}, "done": true}'
+
+    assert niche_service._accumulate_streaming_response(FakeResponse()) == 'AI in Healthcare'
+
+
+def test_extract_json_array(niche_service):
+    """Test lists are extracted from fenced JSON and from plain lines"""
+    fenced = 'Here you go:\n```json\n["a", "b", "c"]\n```\nHope this helps!'
+    assert niche_service._extract_json_array(fenced, 3, 'subtopics') == ['a', 'b', 'c']
+
+    plain = '- "first"\n- second,\n\n* third'
+    assert niche_service._extract_json_array(plain, 3, 'subtopics') == ['first', 'second', 'third']
+
+    with pytest.raises(ValidationError):
+        niche_service._extract_json_array('only one line', 3, 'subtopics')
+
+
+def test_analyze_niche_semantic_cache(niche_service, valid_user_input, monkeypatch):
+    """Test similar topics with the same preferences reuse the cached analysis"""
+    import numpy as np
+    vectors = {
+        'ai in healthcare': np.array([1.0, 0.0], dtype=np.float32),
+        'healthcare ai': np.array([0.99, 0.141], dtype=np.float32),
+        'gardening': np.array([0.0, 1.0], dtype=np.float32)
+    }
+    monkeypatch.setattr(niche_service, '_semantic_enabled', True)
+    monkeypatch.setattr(niche_service, '_embed_topic', lambda topic: vectors[topic.lower().strip()])
+    calls = []
+    def fake_call_ollama(prompt, max_tokens=128, format_schema=None):
+        calls.append(prompt)
+        return json.dumps({
+            'main_topic': 'AI in Healthcare',
+            'subtopics': ['Medical Diagnosis', 'Patient Care', 'Drug Discovery'],
+            'keywords': ['ai', 'healthcare', 'diagnosis', 'machine learning', 'patient care'],
+            'content_style': 'professional',
+            'target_platforms': ['twitter']
+        })
+    monkeypatch.setattr(niche_service, '_call_ollama', fake_call_ollama)
+
+    first = niche_service.analyze_niche(valid_user_input)
+    second = niche_service.analyze_niche({**valid_user_input, 'topic': 'Healthcare AI'})
+    assert len(calls) == 1
+    assert second.main_topic == first.main_topic
+    assert second.subtopics is not first.subtopics
+
+    # Changing a returned analysis leaves the cached one intact
+    first.subtopics.append('Changed')
+    assert 'Changed' not in niche_service.analyze_niche({**valid_user_input, 'topic': 'Healthcare AI'}).subtopics
+
+    niche_service.analyze_niche({**valid_user_input, 'topic': 'Gardening'})
+    assert len(calls) == 2
+
+
+def test_generate_subtopics_structured(niche_service, monkeypatch):
+    """Test structured outputs send the JSON schema and parse the response directly"""
+    schemas = []
+    def fake_call_ollama(prompt, max_tokens=128, format_schema=None):
+        schemas.append(format_schema)
+        return '["Medical Diagnosis", "Patient Care", "Drug Discovery"]'
+    monkeypatch.setattr(niche_service, '_call_ollama', fake_call_ollama)
+    monkeypatch.setattr(niche_service, '_structured', True)
+
+    assert niche_service._generate_subtopics('AI in Healthcare') == ['Medical Diagnosis', 'Patient Care', 'Drug Discovery']
+    assert schemas[0]['type'] == 'array'
+
+
+def test_analyze_niches_batch(niche_service, valid_user_input, monkeypatch):
+    """Test several inputs are analyzed from one batched LLM response"""
+    prompts = []
+    def fake_call_ollama(prompt, max_tokens=128, format_schema=None):
+        prompts.append(prompt)
+        return '```json\n' + json.dumps([
+            {
+                'main_topic': topic,
+                'subtopics': ['a', 'b', 'c'],
+                'keywords': ['k1', 'k2', 'k3', 'k4', 'k5'],
+                'content_style': 'technical',
+                'target_platforms': ['linkedin']
+            }
+            for topic in ('AI in Healthcare', 'Rust Tooling')
+        ]) + '\n```'
+    monkeypatch.setattr(niche_service, '_call_ollama', fake_call_ollama)
+
+    analyses = niche_service.analyze_niches_batch([valid_user_input, {'topic': 'Rust Tooling'}])
+
+    assert len(prompts) == 1
+    assert [a.main_topic for a in analyses] == ['AI in Healthcare', 'Rust Tooling']
+    assert analyses[1].target_platforms == ['linkedin']
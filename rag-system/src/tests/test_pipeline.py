@@ -1,16 +1,15 @@
-import os
+import asyncio
+import mongomock
+from concurrent.futures import ThreadPoolExecutor
 from src.services.rag_service import RAGService
 import json
-from dotenv import load_dotenv
 import pytest
 from datetime import datetime
-from src.services.pipeline_service import PipelineService
-from src.services.niche_analysis_service import NicheAnalysis, NicheAnalysisError, ValidationError
+from src.services.pipeline_service import PipelineService, get_pipeline_service
+from src.services.niche_analysis_service import NicheAnalysis, ValidationError
+from src.services.resource_collection_service import Resource
 
-def test_pipeline():
-    # Load environment variables
-    load_dotenv()
-    
+def test_pipeline(ollama_available):
     # Initialize RAG service
     rag_service = RAGService()
     
@@ -23,36 +22,24 @@ def test_pipeline():
         "source_url": "https://arxiv.org/abs/1706.03762"
     }
     
-    # Test embedding generation
-    print("\nTesting embedding generation...")
-    embedding = rag_service.embed_text(sample_paper["abstract"])
-    print(f"Generated embedding of length: {len(embedding)}")
-    
-    # Test text generation with context
-    print("\nTesting text generation with context...")
-    context_docs = [{
-        "content": sample_paper["abstract"],
-        "score": 1.0
-    }]
-    
+    # Embed, summarize and draft a post for the abstract concurrently
     prompt = "Summarize the key innovation of this paper in one sentence."
-    generated_text = rag_service.generate_with_context(prompt, context_docs)
-    print(f"\nGenerated summary:\n{generated_text}")
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        embedding = executor.submit(rag_service.embed_text, sample_paper["abstract"])
+        summary = executor.submit(rag_service.generate_with_context, sample_paper["abstract"], prompt)
+        post = executor.submit(rag_service.create_twitter_post, sample_paper["abstract"])
+        embedding, summary, post = embedding.result(), summary.result(), post.result()
     
-    # Test Twitter post generation (without posting)
-    print("\nTesting Twitter post generation...")
-    twitter_post = rag_service.create_twitter_post(
-        sample_paper["abstract"], 
-        context_docs,
-        source_url=sample_paper["source_url"]
-    )
-    print(f"\nGenerated Twitter post:\n{twitter_post}")
+    assert len(embedding) > 0
+    assert isinstance(summary, str) and summary
+    assert post["content"]
+    assert post["character_count"] == len(post["content"])
 
-@pytest.fixture
+@pytest.fixture(scope='session')
 def pipeline_service():
     return PipelineService()
 
-@pytest.fixture
+@pytest.fixture(scope='session')
 def valid_request_data():
     return {
         'account_id': 'test_account_123',
@@ -61,40 +48,78 @@ def valid_request_data():
         'platform': 'twitter'
     }
 
-def test_process_content_request(pipeline_service, valid_request_data):
+def test_process_content_request(ollama_available, pipeline_service, valid_request_data):
     """Test the complete content request pipeline"""
-    try:
-        result = pipeline_service.process_content_request(
-            account_id=valid_request_data['account_id'],
-            topic=valid_request_data['topic'],
-            query=valid_request_data['query'],
-            platform=valid_request_data['platform']
-        )
-        
-        # Verify result structure
-        assert isinstance(result, dict)
-        assert 'account_id' in result
-        assert 'post_id' in result
-        assert 'content' in result
-        assert 'platform' in result
-        assert 'generated_at' in result
-        assert 'performance_metrics' in result
-    except NicheAnalysisError:
-        # Skip test if Ollama service is not available
-        pytest.skip("Ollama service not available")
+    result = pipeline_service.process_content_request(
+        account_id=valid_request_data['account_id'],
+        topic=valid_request_data['topic'],
+        query=valid_request_data['query'],
+        platform=valid_request_data['platform']
+    )
+    
+    # Verify result structure
+    assert isinstance(result, dict)
+    assert 'account_id' in result
+    assert 'post_id' in result
+    assert 'content' in result
+    assert 'platform' in result
+    assert 'generated_at' in result
+    assert 'performance_metrics' in result
 
-def test_process_content_request_missing_platform(pipeline_service, valid_request_data):
+def test_process_content_request_missing_platform(ollama_available, pipeline_service, valid_request_data):
     """Test content request with missing platform (should default to twitter)"""
-    try:
-        result = pipeline_service.process_content_request(
-            account_id=valid_request_data['account_id'],
-            topic=valid_request_data['topic'],
-            query=valid_request_data['query']
-        )
-        assert result['platform'] == 'twitter'
-    except NicheAnalysisError:
-        # Skip test if Ollama service is not available
-        pytest.skip("Ollama service not available")
+    result = pipeline_service.process_content_request(
+        account_id=valid_request_data['account_id'],
+        topic=valid_request_data['topic'],
+        query=valid_request_data['query']
+    )
+    assert result['platform'] == 'twitter'
+
+def test_process_content_request_async(pipeline_service, valid_request_data):
+    """Test the async content request pipeline"""
+    result = asyncio.run(pipeline_service.process_content_request_async(
+        account_id=valid_request_data['account_id'],
+        topic=valid_request_data['topic'],
+        query=valid_request_data['query'],
+        platform=valid_request_data['platform']
+    ))
+    
+    # Unavailable services fall back to default analysis and content
+    assert result['account_id'] == valid_request_data['account_id']
+    assert result['platform'] == 'twitter'
+    assert isinstance(result['content'], str)
+    assert 'post_id' in result
+
+def test_collect_resources(pipeline_service, monkeypatch):
+    """Test collected resources are stored in one bulk write with their type"""
+    analysis = NicheAnalysis(
+        main_topic='AI in Healthcare',
+        subtopics=['Medical Diagnosis'],
+        keywords=['ai', 'healthcare'],
+        content_style='professional',
+        target_platforms=['twitter'],
+        generated_at=datetime.now()
+    )
+    class FakeResourceService:
+        def collect_resources(self, analysis, limit):
+            return [
+                Resource(f'res_{i}', f'Resource {i}', {'source': 'test'}, 'paper', ['ai'], datetime.now())
+                for i in range(limit)
+            ]
+    rag_service = RAGService(mongo_client=mongomock.MongoClient())
+    monkeypatch.setattr(pipeline_service, 'resource_service', FakeResourceService())
+    monkeypatch.setattr(pipeline_service, 'rag_service', rag_service)
+
+    resource_ids = pipeline_service.collect_resources('test_account_123', analysis, limit=2)
+    assert len(set(resource_ids)) == 2
+
+    stored = list(rag_service.db.resources.find({'account_id': 'test_account_123'}))
+    assert sorted(doc['content'] for doc in stored) == ['Resource 0', 'Resource 1']
+    assert all(doc['metadata'] == {'source': 'test', 'resource_type': 'paper'} for doc in stored)
+
+def test_get_pipeline_service_singleton():
+    """Test the shared pipeline is created once"""
+    assert get_pipeline_service() is get_pipeline_service()
 
 def test_process_content_request_invalid_platform(pipeline_service, valid_request_data):
     """Test content request with invalid platform"""
@@ -106,19 +131,15 @@ def test_process_content_request_invalid_platform(pipeline_service, valid_reques
             platform='invalid_platform'
         )
 
-def test_process_content_request_missing_query(pipeline_service, valid_request_data):
+def test_process_content_request_missing_query(ollama_available, pipeline_service, valid_request_data):
     """Test content request with missing query (should use topic as query)"""
-    try:
-        result = pipeline_service.process_content_request(
-            account_id=valid_request_data['account_id'],
-            topic=valid_request_data['topic'],
-            platform=valid_request_data['platform']
-        )
-        assert isinstance(result['content'], str)
-        assert len(result['content']) > 0
-    except NicheAnalysisError:
-        # Skip test if Ollama service is not available
-        pytest.skip("Ollama service not available")
+    result = pipeline_service.process_content_request(
+        account_id=valid_request_data['account_id'],
+        topic=valid_request_data['topic'],
+        platform=valid_request_data['platform']
+    )
+    assert isinstance(result['content'], str)
+    assert len(result['content']) > 0
 
 def test_process_content_request_error_handling(pipeline_service):
     """Test error handling in content request processing"""
@@ -131,4 +152,4 @@ def test_process_content_request_error_handling(pipeline_service):
         )
 
 if __name__ == "__main__":
-    test_pipeline() 
\ No newline at end of file
+    pytest.main([__file__]) 
\ No newline at end of file
@@ -1,21 +1,72 @@
-import pytest
-from services.rag_service import RAGService
 import os
-from dotenv import load_dotenv
-from datetime import datetime
+import pytest
+import orjson
+import mongomock
+from services.rag_service import RAGService, get_rag_service, _quantize_embedding, _MongoStore
 from src.services.niche_analysis_service import NicheAnalysisError
 
-# Load test environment variables
-load_dotenv(os.path.join(os.path.dirname(__file__), '.env.test'))
+
+@pytest.fixture(scope='session')
+def _rag_service():
+    """Create one RAG service for the test session, backed by an in-process mongomock client."""
+    service = RAGService(mongo_client=mongomock.MongoClient())
+    # Create the indexes before tests replace the storage backend
+    service._ensure_started()
+    return service
+
+
+# Records every test starts from
+SEED_ACCOUNT_ID = 'test_account_123'
+SEED_PREFERENCES = {
+    'niche': 'Healthcare AI',
+    'subtopics': ['Medical Diagnosis'],
+    'keywords': ['AI', 'healthcare'],
+    'style': 'professional',
+    'platforms': ['twitter']
+}
+SEED_RESOURCE = {
+    'account_id': SEED_ACCOUNT_ID,
+    'resource_id': 'test_resource_123',
+    'content': 'AI in healthcare is revolutionizing medical diagnosis.',
+    'metadata': {'source': 'test'},
+    'keywords': ['AI', 'healthcare'],
+    'usage_count': 0,
+    'last_used': None
+}
+
+
+def _seed(store, created_at):
+    """Write the seed records into a storage backend."""
+    store.store_account(SEED_ACCOUNT_ID)
+    store.store_preferences(SEED_ACCOUNT_ID, SEED_PREFERENCES)
+    store.resources.insert_one({**SEED_RESOURCE, 'created_at': created_at})
+
+
+@pytest.fixture(scope='session')
+def _rag_template(_rag_service, generated_at):
+    """Seed records once per session into a template database to copy."""
+    template_db = _rag_service.mongo_client['template']
+    _seed(_MongoStore(template_db), generated_at)
+    return template_db
+
 
 @pytest.fixture
-def rag_service():
-    """Create a RAG service instance for testing."""
-    service = RAGService()
-    yield service
-    # Cleanup after tests
-    if hasattr(service, 'db'):
-        service.db.drop_database(os.getenv('DB_NAME'))
+def rag_service(_rag_service, _rag_template, monkeypatch):
+    """
+    Shared RAG service holding a fresh copy of the seed records for each test.
+    
+    The embedding cache is kept for the whole session, so identical text is
+    embedded once; it is keyed by model name, so tests faking a model do not mix
+    their vectors with real ones.
+    """
+    for name in _rag_template.list_collection_names():
+        _rag_service.db[name].insert_many(_rag_template[name].find())
+    monkeypatch.setattr(_rag_service, '_store', _MongoStore(_rag_service.db))
+    yield _rag_service
+    # Clearing collections keeps the indexes created with the service
+    for name in _rag_service.db.list_collection_names():
+        _rag_service.db[name].delete_many({})
+
 
 @pytest.fixture
 def test_document():
@@ -29,17 +80,19 @@ def test_document():
         }
     }
 
+
 @pytest.fixture
-def sample_document():
+def sample_document(generated_at):
     return {
         'content': 'AI in healthcare is revolutionizing medical diagnosis through machine learning algorithms.',
         'metadata': {
             'title': 'AI in Medical Diagnosis',
             'source': 'test_source',
-            'date': datetime.now().isoformat()
+            'date': generated_at.isoformat()
         }
     }
 
+
 def test_get_embeddings(rag_service):
     """Test embedding generation."""
     text = "Test text for embedding"
@@ -47,6 +100,7 @@ def test_get_embeddings(rag_service):
     assert isinstance(embeddings, list)
     assert len(embeddings) == 300  # Assuming 300-dimensional embeddings
 
+
 def test_store_document(rag_service, test_document):
     """Test document storage."""
     doc_id = rag_service.store_document(
@@ -56,6 +110,7 @@ def test_store_document(rag_service, test_document):
     assert isinstance(doc_id, str)
     assert len(doc_id) > 0
 
+
 def test_retrieve_documents(rag_service, test_document):
     """Test document retrieval."""
     # First store a document
@@ -73,6 +128,7 @@ def test_retrieve_documents(rag_service, test_document):
     assert "content" in similar_docs[0]
     assert "metadata" in similar_docs[0]
 
+
 def test_generate_with_context(rag_service):
     """Test content generation with context."""
     context = "Recent advances in transformer architecture"
@@ -82,6 +138,7 @@ def test_generate_with_context(rag_service):
     assert isinstance(result, str)
     assert len(result) > 0
 
+
 def test_create_twitter_post(rag_service):
     """Test Twitter post creation."""
     content = "Test content for Twitter post"
@@ -94,22 +151,26 @@ def test_create_twitter_post(rag_service):
     assert "mentions" in post
     assert len(post["content"]) <= 280  # Twitter character limit
 
+
 def test_empty_content(rag_service):
     """Test handling of empty content."""
     with pytest.raises(ValueError):
         rag_service.store_document("", {})
 
+
 def test_empty_query(rag_service):
     """Test handling of empty query."""
     with pytest.raises(ValueError):
         rag_service.retrieve_documents("")
 
+
 def test_store_account(rag_service):
     """Test storing a new account"""
     account_id = 'test_account_123'
     result = rag_service.store_account(account_id)
     assert isinstance(result, str)
 
+
 def test_store_preferences(rag_service):
     """Test storing account preferences"""
     account_id = 'test_account_123'
@@ -123,6 +184,7 @@ def test_store_preferences(rag_service):
     result = rag_service.store_preferences(account_id, preferences)
     assert isinstance(result, str)
 
+
 def test_store_resource(rag_service, sample_document):
     """Test storing a new resource"""
     account_id = 'test_account_123'
@@ -133,7 +195,8 @@ def test_store_resource(rag_service, sample_document):
     )
     assert isinstance(result, str)
 
-def test_store_post(rag_service):
+
+def test_store_post(rag_service, generated_at):
     """Test storing a generated post"""
     account_id = 'test_account_123'
     resource_id = 'test_resource_123'
@@ -141,7 +204,7 @@ def test_store_post(rag_service):
     platform = 'twitter'
     metadata = {
         'style': 'professional',
-        'generated_at': datetime.now().isoformat()
+        'generated_at': generated_at.isoformat()
     }
     result = rag_service.store_post(
         account_id=account_id,
@@ -152,18 +215,55 @@ def test_store_post(rag_service):
     )
     assert isinstance(result, str)
 
+
+def test_store_resources_bulk(rag_service):
+    """Test storing several resources in one call"""
+    resources = [
+        {'content': f'Resource {i}', 'metadata': {'source': 'test'}, 'keywords': ['ai']}
+        for i in range(3)
+    ]
+    result = rag_service.store_resources_bulk('test_account_123', resources)
+    assert len(result) == 3
+    assert len(set(result)) == 3
+
+
+def test_store_posts_bulk(rag_service):
+    """Test storing several posts in one call keeps their order and fields"""
+    posts = [
+        {
+            'resource_id': 'test_resource_123',
+            'content': f'Post {i}',
+            'platform': 'twitter',
+            'metadata': {'platform_specific': {'thread_index': i}}
+        }
+        for i in range(2)
+    ]
+    result = rag_service.store_posts_bulk('test_account_123', posts)
+    assert len(set(result)) == 2
+
+    stored = {str(doc['_id']): doc for doc in rag_service.db.posts.find({'account_id': 'test_account_123'})}
+    assert set(stored) == set(result)
+    assert [stored[post_id]['content'] for post_id in result] == ['Post 0', 'Post 1']
+    assert stored[result[1]]['resource_id'] == 'test_resource_123'
+    assert stored[result[1]]['platform_specific_metadata'] == {'thread_index': 1}
+    assert stored[result[0]]['performance_metrics']['views'] == 0
+    assert rag_service.store_posts_bulk('test_account_123', []) == []
+
+
 def test_get_account_preferences(rag_service):
     """Test retrieving account preferences"""
     account_id = 'test_account_123'
     preferences = rag_service.get_account_preferences(account_id)
     assert isinstance(preferences, dict)
 
+
 def test_get_resource(rag_service):
     """Test retrieving a stored resource"""
     resource_id = 'test_resource_123'
     resource = rag_service.get_resource(resource_id)
     assert isinstance(resource, dict)
 
+
 def test_create_twitter_post(rag_service):
     """Test creating a Twitter post"""
     content = 'AI in healthcare is revolutionizing medical diagnosis.'
@@ -174,10 +274,157 @@ def test_create_twitter_post(rag_service):
     assert isinstance(result['content'], str)
     assert len(result['content']) <= 280  # Twitter character limit
 
+
 def test_generate_with_context(rag_service):
     """Test generating content with context"""
     context = 'AI in healthcare is transforming medical diagnosis.'
     query = 'How is AI used in medical diagnosis?'
     result = rag_service.generate_with_context(context, query)
     assert isinstance(result, str)
-    assert len(result) > 0 
\ No newline at end of file
+    assert len(result) > 0 
+
+
+def test_embed_text_cached(rag_service, monkeypatch):
+    """Test repeated text is embedded once"""
+    calls = []
+    class FakeResponse:
+        def raise_for_status(self):
+            pass
+        content = b'{"embedding": [0.1, 0.2, 0.3]}'
+    def fake_post(url, data=None, **kwargs):
+        calls.append(orjson.loads(data)['prompt'])
+        return FakeResponse()
+    monkeypatch.setattr(rag_service, 'ollama_host', 'http://ollama', raising=False)
+    monkeypatch.setattr(rag_service, 'model_name', 'test-model', raising=False)
+    monkeypatch.setattr(rag_service.session, 'post', fake_post)
+
+    assert rag_service.embed_text('same text') == [0.1, 0.2, 0.3]
+    assert rag_service.embed_text('same text') == [0.1, 0.2, 0.3]
+    assert calls == ['same text']
+
+
+def test_embed_texts_batch(rag_service, monkeypatch):
+    """Test uncached texts are embedded in one batch request"""
+    calls = []
+    class FakeResponse:
+        def __init__(self, inputs):
+            self.inputs = inputs
+        def raise_for_status(self):
+            pass
+        @property
+        def content(self):
+            return orjson.dumps({'embeddings': [[float(len(text))] for text in self.inputs]})
+    def fake_post(url, data=None, **kwargs):
+        inputs = orjson.loads(data)['input']
+        calls.append(inputs)
+        return FakeResponse(inputs)
+    monkeypatch.setattr(rag_service, 'ollama_host', 'http://ollama', raising=False)
+    monkeypatch.setattr(rag_service, 'model_name', 'test-model', raising=False)
+    monkeypatch.setattr(rag_service.session, 'post', fake_post)
+
+    assert rag_service.embed_texts(['a', 'bb']) == [[1.0], [2.0]]
+    assert rag_service.embed_texts(['bb', 'ccc']) == [[2.0], [3.0]]
+    assert calls == [['a', 'bb'], ['ccc']]
+
+
+def test_get_account_preferences_latest(rag_service):
+    """Test the most recently stored preferences are returned"""
+    account_id = 'test_account_latest'
+    rag_service.store_preferences(account_id=account_id, preferences={'niche': 'first'})
+    rag_service.store_preferences(account_id=account_id, preferences={'niche': 'second'})
+    assert rag_service.get_account_preferences(account_id)['niche'] == 'second'
+
+
+def test_generate_with_context_stream(rag_service, monkeypatch):
+    """Test streamed chat chunks are yielded as they arrive"""
+    class FakeResponse:
+        def __enter__(self):
+            return self
+        def __exit__(self, *args):
+            pass
+        def raise_for_status(self):
+            pass
+        def iter_lines(self):
+            yield b'{"message": {"content": "Hello"}, "done": false}'
+            yield b''
+            yield b'{"message": {"content": " world"}, "done": false}'
+            yield b'{"message": {"content": ""}, "done": true}'
+    monkeypatch.setattr(rag_service, 'ollama_host', 'http://ollama', raising=False)
+    monkeypatch.setattr(rag_service, '_chat_body', {'model': 'test-model', 'stream': False}, raising=False)
+    monkeypatch.setattr(rag_service.session, 'post', lambda url, **kwargs: FakeResponse())
+
+    assert list(rag_service.generate_with_context_stream('context', 'query')) == ['Hello', ' world']
+
+
+def test_store_document_embedding_failure(rag_service, monkeypatch):
+    """Test documents that fail to embed are not stored, so a retry can embed them"""
+    monkeypatch.setattr(rag_service, 'embed_text', lambda text: [])
+    with pytest.raises(ValueError):
+        rag_service.store_document('unembedded content', {}, 'paper')
+    monkeypatch.setattr(rag_service, 'embed_texts', lambda texts: [[] if text == 'failed' else [0.1, 0.2] for text in texts])
+    ids = rag_service.store_documents_bulk([
+        {'content': 'failed', 'doc_type': 'paper'},
+        {'content': 'embedded', 'doc_type': 'paper'}
+    ])
+    assert ids[0] is None and ids[1] is not None
+
+    monkeypatch.setattr(rag_service, 'embed_text', lambda text: [0.1, 0.2])
+    assert rag_service.store_document('unembedded content', {}, 'paper')
+    assert rag_service.metadata_collection.count_documents({}) == 2
+
+
+def test_indexes_created_despite_duplicate_accounts():
+    """Test a unique index failing on existing duplicates does not block the other indexes"""
+    client = mongomock.MongoClient()
+    client[os.getenv('DB_NAME', 'llm_papers')].accounts.insert_many([{'account_id': 'dup'}, {'account_id': 'dup'}])
+    service = RAGService(mongo_client=client)
+    service._ensure_started()
+    assert 'content_hash_1' in service.metadata_collection.index_information()
+    assert 'account_id_1' not in service.db.accounts.index_information()
+
+
+def test_mongo_connected_on_first_use():
+    """Test construction does not touch MongoDB and the first call connects and indexes it"""
+    client = mongomock.MongoClient()
+    service = RAGService(mongo_client=client)
+    assert service.ollama_host and service.model_name
+    assert 'content_hash_1' not in service.metadata_collection.index_information()
+
+    service.store_account('lazy_account')
+    assert isinstance(service._store, _MongoStore)
+    assert 'content_hash_1' in service.metadata_collection.index_information()
+
+
+def test_quantize_embedding():
+    """Test embeddings are stored as int8 vectors that keep their direction"""
+    embedding = [0.5, -0.25, 0.125, 0.0]
+    quantized = _quantize_embedding(embedding)
+    vector = quantized['embedding'].as_vector()
+    assert quantized['dim'] == 4
+    assert list(vector.data) == [127, -64, 32, 0]
+    restored = [value * quantized['scale'] for value in vector.data]
+    assert restored == pytest.approx(embedding, abs=quantized['scale'])
+
+
+def test_ttl_cache_expires(monkeypatch):
+    """Test cached lookups expire after their TTL"""
+    from services import rag_service as rag_module
+    now = [100.0]
+    monkeypatch.setattr(rag_module.time, 'monotonic', lambda: now[0])
+    cache = rag_module._TTLCache(maxsize=2, ttl=30)
+    cache.put('a', {'niche': 'ai'})
+    assert cache.get('a') == {'niche': 'ai'}
+    now[0] += 31
+    assert cache.get('a') is None
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.put('c', 3)
+    assert cache.get('a') is None
+    cache.pop('b')
+    assert cache.get('b') is None
+    assert cache.get('c') == 3
+
+
+def test_get_rag_service_singleton():
+    """Test the process-wide service is created once"""
+    assert get_rag_service() is get_rag_service()
@@ -1,148 +1,132 @@
-import unittest
+import pytest
 from datetime import datetime
 from services.resource_collection_service import ResourceCollectionService, Resource
 from services.niche_analysis_service import NicheAnalysis
-import os
-from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
+@pytest.fixture(scope='session')
+def service():
+    """Resource collection service shared by every test; it holds no per-test state."""
+    return ResourceCollectionService()
 
-class TestResourceCollectionService(unittest.TestCase):
-    def setUp(self):
-        """Set up test fixtures."""
-        self.service = ResourceCollectionService()
-        self.test_analysis = NicheAnalysis(
-            main_topic="Large Language Models",
-            subtopics=["transformer architecture", "attention mechanisms"],
-            keywords=["llm", "transformer", "attention", "neural networks"],
-            content_style="professional",
-            target_platforms=["twitter"],
-            generated_at=datetime.now()
-        )
+@pytest.fixture(scope='session')
+def test_analysis(generated_at):
+    """Analysis to collect resources for; tests must not mutate it."""
+    return NicheAnalysis(
+        main_topic="Large Language Models",
+        subtopics=["transformer architecture", "attention mechanisms"],
+        keywords=["llm", "transformer", "attention", "neural networks"],
+        content_style="professional",
+        target_platforms=["twitter"],
+        generated_at=generated_at
+    )
 
-    def test_collect_resources(self):
-        """Test collecting resources based on niche analysis."""
-        try:
-            resources = self.service.collect_resources(
-                analysis=self.test_analysis,
-                limit=5
-            )
-            
-            # Verify resources were collected
-            self.assertIsInstance(resources, list)
-            self.assertTrue(len(resources) > 0)
-            
-            # Verify resource structure
-            for resource in resources:
-                self.assertIsInstance(resource, Resource)
-                self.assertIsInstance(resource.resource_id, str)
-                self.assertIsInstance(resource.content, str)
-                self.assertIsInstance(resource.metadata, dict)
-                self.assertIsInstance(resource.resource_type, str)
-                self.assertIsInstance(resource.keywords, list)
-                self.assertIsInstance(resource.collected_at, datetime)
-                
-                # Verify metadata fields
-                self.assertIn('title', resource.metadata)
-                self.assertIn('source', resource.metadata)
-                self.assertIn('url', resource.metadata)
-                
-        except Exception as e:
-            self.fail(f"Failed to collect resources: {str(e)}")
+def test_collect_resources(service, test_analysis):
+    """Test collecting resources based on niche analysis."""
+    resources = service.collect_resources(
+        analysis=test_analysis,
+        limit=5
+    )
+    
+    # Verify resources were collected
+    assert isinstance(resources, list)
+    assert len(resources) > 0
+    
+    # Verify resource structure
+    for resource in resources:
+        assert isinstance(resource, Resource)
+        assert isinstance(resource.resource_id, str)
+        assert isinstance(resource.content, str)
+        assert isinstance(resource.metadata, dict)
+        assert isinstance(resource.resource_type, str)
+        assert isinstance(resource.keywords, list)
+        assert isinstance(resource.collected_at, datetime)
+        
+        # Verify metadata fields
+        assert 'title' in resource.metadata
+        assert 'source' in resource.metadata
+        assert 'url' in resource.metadata
 
-    def test_get_resource(self):
-        """Test retrieving a specific resource."""
-        # First collect some resources
-        resources = self.service.collect_resources(
-            analysis=self.test_analysis,
-            limit=1
-        )
+def test_get_resource(service, test_analysis):
+    """Test retrieving a specific resource."""
+    # First collect some resources
+    resources = service.collect_resources(
+        analysis=test_analysis,
+        limit=1
+    )
+    
+    if resources:
+        resource_id = resources[0].resource_id
         
-        if resources:
-            resource_id = resources[0].resource_id
-            
-            # Try to retrieve the resource
-            retrieved_resource = self.service.get_resource(resource_id)
-            
-            # Verify the retrieved resource
-            self.assertIsInstance(retrieved_resource, Resource)
-            self.assertEqual(retrieved_resource.resource_id, resource_id)
-            self.assertEqual(retrieved_resource.content, resources[0].content)
-            self.assertEqual(retrieved_resource.metadata, resources[0].metadata)
-            self.assertEqual(retrieved_resource.resource_type, resources[0].resource_type)
-            self.assertEqual(retrieved_resource.keywords, resources[0].keywords)
+        # Try to retrieve the resource
+        retrieved_resource = service.get_resource(resource_id)
+        
+        # Verify the retrieved resource
+        assert isinstance(retrieved_resource, Resource)
+        assert retrieved_resource.resource_id == resource_id
+        assert retrieved_resource.content == resources[0].content
+        assert retrieved_resource.metadata == resources[0].metadata
+        assert retrieved_resource.resource_type == resources[0].resource_type
+        assert retrieved_resource.keywords == resources[0].keywords
 
-    def test_collect_papers(self):
-        """Test collecting academic papers."""
-        try:
-            papers = self.service._collect_papers(
-                main_topic=self.test_analysis.main_topic,
-                keywords=self.test_analysis.keywords,
-                limit=3
-            )
-            
-            # Verify papers were collected
-            self.assertIsInstance(papers, list)
-            self.assertTrue(len(papers) > 0)
-            
-            # Verify paper structure
-            for paper in papers:
-                self.assertIsInstance(paper, Resource)
-                self.assertEqual(paper.resource_type, "paper")
-                self.assertIn('arxiv_id', paper.metadata)
-                self.assertIn('authors', paper.metadata)
-                self.assertIn('published_date', paper.metadata)
-                
-        except Exception as e:
-            self.fail(f"Failed to collect papers: {str(e)}")
+def test_collect_papers(service, test_analysis):
+    """Test collecting academic papers."""
+    papers = service._collect_papers(
+        main_topic=test_analysis.main_topic,
+        keywords=test_analysis.keywords,
+        limit=3
+    )
+    
+    # Verify papers were collected
+    assert isinstance(papers, list)
+    assert len(papers) > 0
+    
+    # Verify paper structure
+    for paper in papers:
+        assert isinstance(paper, Resource)
+        assert paper.resource_type == "paper"
+        assert 'arxiv_id' in paper.metadata
+        assert 'authors' in paper.metadata
+        assert 'published_date' in paper.metadata
 
-    def test_collect_repositories(self):
-        """Test collecting GitHub repositories."""
-        try:
-            repos = self.service._collect_repositories(
-                main_topic=self.test_analysis.main_topic,
-                keywords=self.test_analysis.keywords,
-                limit=3
-            )
-            
-            # Verify repositories were collected
-            self.assertIsInstance(repos, list)
-            self.assertTrue(len(repos) > 0)
-            
-            # Verify repository structure
-            for repo in repos:
-                self.assertIsInstance(repo, Resource)
-                self.assertEqual(repo.resource_type, "repository")
-                self.assertIn('repo_name', repo.metadata)
-                self.assertIn('owner', repo.metadata)
-                self.assertIn('stars', repo.metadata)
-                self.assertIn('language', repo.metadata)
-                
-        except Exception as e:
-            self.fail(f"Failed to collect repositories: {str(e)}")
+def test_collect_repositories(service, test_analysis):
+    """Test collecting GitHub repositories."""
+    repos = service._collect_repositories(
+        main_topic=test_analysis.main_topic,
+        keywords=test_analysis.keywords,
+        limit=3
+    )
+    
+    # Verify repositories were collected
+    assert isinstance(repos, list)
+    assert len(repos) > 0
+    
+    # Verify repository structure
+    for repo in repos:
+        assert isinstance(repo, Resource)
+        assert repo.resource_type == "repository"
+        assert 'repo_name' in repo.metadata
+        assert 'owner' in repo.metadata
+        assert 'stars' in repo.metadata
+        assert 'language' in repo.metadata
 
-    def test_invalid_resource_id(self):
-        """Test retrieving a non-existent resource."""
-        retrieved_resource = self.service.get_resource("invalid_id")
-        self.assertIsNone(retrieved_resource)
+def test_invalid_resource_id(service):
+    """Test retrieving a non-existent resource."""
+    retrieved_resource = service.get_resource("invalid_id")
+    assert retrieved_resource is None
 
-    def test_empty_keywords(self):
-        """Test collecting resources with empty keywords."""
-        empty_analysis = NicheAnalysis(
-            main_topic="Large Language Models",
-            subtopics=[],
-            keywords=[],
-            content_style="professional",
-            target_platforms=["twitter"],
-            generated_at=datetime.now()
+def test_empty_keywords(service, generated_at):
+    """Test collecting resources with empty keywords."""
+    empty_analysis = NicheAnalysis(
+        main_topic="Large Language Models",
+        subtopics=[],
+        keywords=[],
+        content_style="professional",
+        target_platforms=["twitter"],
+        generated_at=generated_at
+    )
+    
+    with pytest.raises(Exception):
+        service.collect_resources(
+            analysis=empty_analysis,
+            limit=5
         )
-        
-        with self.assertRaises(Exception):
-            self.service.collect_resources(
-                analysis=empty_analysis,
-                limit=5
-            )
-
-if __name__ == '__main__':
-    unittest.main() 
\ No newline at end of file